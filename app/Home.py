@@ -3,42 +3,37 @@ import sys
 import pysqlite3
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-from preprocess import encode_image
-from agents import agent1_food_image_caption, agent2_nutrition_augmentation, agent3_parse_nutrition, agent4_create_summary
-import chromadb
-import chromadb.config
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from preprocess import prepare_image
+from agents import agent1_food_image_caption, agent2_nutrition_augmentation_stream, agent_structured_analysis, run_save_agents, ANALYSIS_MODE
 import streamlit as st
-import boto3
-from PIL import Image
-import os
-import pandas as pd
 from preprocess import upload_image
-import streamlit as st
-import streamlit_authenticator as stauth
+from vector_store import get_vector_store, VECTOR_BACKEND
+from result_cache import ResultCache, content_hash
+from resilience import LatencyBudget, latency_budget
 
-from streamlit_google_auth import Authenticate
 from mongodb import MongoDB
 import datetime
 
 from user import show_user_profile
 
 
+def authenticate():
+    """Sign the user in with Google when the page runs, not when Home is imported"""
+    from streamlit_google_auth import Authenticate
 
-authenticator = Authenticate(
-    secret_credentials_path='./.streamlit/google_credentials.json',
-    cookie_name='my_cookie_name',
-    cookie_key='this_is_secret',
-    redirect_uri='http://localhost:5173',
-)
+    authenticator = Authenticate(
+        secret_credentials_path='./.streamlit/google_credentials.json',
+        cookie_name='my_cookie_name',
+        cookie_key='this_is_secret',
+        redirect_uri='http://localhost:5173',
+    )
 
-authenticator.check_authentification()
+    authenticator.check_authentification()
 
-# Display user profile in sidebar
-show_user_profile(authenticator)
+    # Display user profile in sidebar
+    show_user_profile(authenticator)
+    return authenticator
 
-OPENAI_API_KEY = st.secrets["general"]["OPENAI_API_KEY"]
 # def get_db_json():
 #     return Chroma(
 #         collection_name="food_items_collection",
@@ -46,51 +41,10 @@ OPENAI_API_KEY = st.secrets["general"]["OPENAI_API_KEY"]
 #         persist_directory="../data/food_db/vector_db_json"
 #     )
 
-def download_s3_bucket(bucket_name, local_dir):
-    # Create an S3 client
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=st.secrets["aws"]["AWS_ACCESS_KEY_ID"],
-        aws_secret_access_key=st.secrets["aws"]["AWS_SECRET_ACCESS_KEY"],
-        region_name=st.secrets["aws"]["AWS_DEFAULT_REGION"]
-    )
-
-    paginator = s3.get_paginator('list_objects_v2')
-    operation_parameters = {'Bucket': bucket_name}
-    
-    for page in paginator.paginate(**operation_parameters):
-        if 'Contents' in page:
-            for obj in page['Contents']:
-                key = obj['Key']
-                local_file_path = os.path.join(local_dir, key)
-
-                # Create local directory structure if it doesn't exist
-                os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-
-                # Download the file
-                print(f"Downloading {key} to {local_file_path}")
-                s3.download_file(bucket_name, key, local_file_path)
-
-def initialize_db():
-    """Initialize database connection if not already in session state"""
-    if 'vector_db' not in st.session_state:
-        with st.spinner("Loading database..."):
-            # Define S3 and local paths
-            bucket_name = "food-ai-db" 
-            local_dir = "../data/food_db_cloud/" 
-
-            # Call the function
-            download_s3_bucket(bucket_name, local_dir)
-
-            db_path = os.path.join(local_dir, "vector_db_json")
-
-            # Load the Chroma database
-            st.session_state.vector_db = Chroma(
-                collection_name="food_items_collection",
-                embedding_function=OpenAIEmbeddings(model="text-embedding-3-large", api_key=st.secrets["general"]["OPENAI_API_KEY"]),
-                persist_directory=db_path
-            )
-    return st.session_state.vector_db
+def initialize_db(backend=VECTOR_BACKEND):
+    """Return the vector store shared by all sessions, loading it on first use"""
+    with st.spinner("Loading database..."):
+        return get_vector_store(backend)
 
 def save_analysis_to_db(email, image_data, ingredients, nutrition_info, nutrition_df, augmented_info):
     """
@@ -128,6 +82,11 @@ def save_analysis_to_db(email, image_data, ingredients, nutrition_info, nutritio
         st.error(f"Error saving to database: {str(e)}")
         return False, str(e)
 
+@st.cache_resource
+def get_result_cache():
+    """Vision agent results shared by all sessions and persisted across restarts"""
+    return ResultCache()
+
 @st.cache_data
 def get_source_information():
     return """
@@ -140,6 +99,7 @@ def get_source_information():
     """
 
 if __name__ == "__main__":
+    authenticate()
 
     # Streamlit app
     st.title("🍎 Food AI")
@@ -154,36 +114,60 @@ if __name__ == "__main__":
     if uploaded_file is None:
         st.info("Please upload a JPG, PNG, or JPEG image of your food to get started!")
     else:
-        # Clear session state if a new image is uploaded
-        current_file_name = getattr(uploaded_file, 'name', None)
-        if 'last_uploaded_file' not in st.session_state or st.session_state.last_uploaded_file != current_file_name:
+        # Clear session state if a new image is uploaded; compare content, not file names
+        image_bytes = uploaded_file.getvalue()
+        current_image_hash = content_hash(image_bytes)
+        if 'last_uploaded_hash' not in st.session_state or st.session_state.last_uploaded_hash != current_image_hash:
             if 'current_analysis' in st.session_state:
                 del st.session_state.current_analysis
-            st.session_state.last_uploaded_file = current_file_name
+            st.session_state.last_uploaded_hash = current_image_hash
 
         # Initialize analysis if not already done
         if 'current_analysis' not in st.session_state:
             st.session_state.current_analysis = {}
             
+            # PIL is only needed once an image has been uploaded
+            from PIL import Image
+
             image = Image.open(uploaded_file)
             upload_image(uploaded_file)
             st.image(image, caption="Uploaded Food Image", use_container_width=True)
 
-            # Encode image and extract ingredients
+            # Downscale and re-encode the image, then extract ingredients unless this image
+            # (or a near-duplicate of it) was analyzed before
+            # All model calls for this upload share one latency budget
+            upload_budget = LatencyBudget()
             with st.spinner("Processing image to extract food ingredients..."):
-                encoded_image = encode_image(uploaded_file)
-                ingredients = agent1_food_image_caption(encoded_image)
+                encoded_image, mime_type, _ = prepare_image(uploaded_file)
+                cached_result = get_result_cache().get(image_bytes)
+                if cached_result is not None:
+                    ingredients = cached_result['ingredients']
+                else:
+                    # agent1's latency is recorded by the agent metrics
+                    with latency_budget(upload_budget):
+                        ingredients = agent1_food_image_caption(encoded_image, mime_type)
 
             if ingredients[0] == 'False':
                 st.error("Sorry, we couldn't identify the food in the image. Please try again with a clearer image.")
                 st.stop()
 
+            if cached_result is None:
+                get_result_cache().put(image_bytes, ingredients)
+
             # Store all analysis results in session state
             st.session_state.current_analysis = {
                 'ingredients': ingredients,
                 'encoded_image': encoded_image,
+                'mime_type': mime_type,
+                'latency_budget': upload_budget,
                 'uploaded_file': uploaded_file
             }
+            if cached_result is not None and cached_result['nutrition_augmentation']:
+                st.session_state.current_analysis['nutrition_augmentation'] = cached_result['nutrition_augmentation']
+                # Totals stored by an earlier analysis of this image also skip the structured call or agent3/agent4 on save
+                if cached_result['totals'] is not None:
+                    st.session_state.current_analysis['final_nutrition_info'] = cached_result['totals']
+                    st.session_state.current_analysis['text_summary'] = cached_result['summary']
 
         # Now we can safely access the ingredients
         ingredients = st.session_state.current_analysis['ingredients']
@@ -197,8 +181,9 @@ if __name__ == "__main__":
                 db = initialize_db()
                 nutrition_info = {}
                 display_info = {}
-                for ingredient in ingredients:
-                    similar_doc = db.similarity_search(ingredient, k=1)
+                # One embedding request and one index query for the whole meal
+                matches = db.batch_similarity_search(ingredients, k=1)
+                for ingredient, similar_doc in zip(ingredients, matches):
                     food_description = similar_doc[0].page_content if similar_doc else None
                     metadata = similar_doc[0].metadata
                     display_info[ingredient] = metadata
@@ -215,6 +200,8 @@ if __name__ == "__main__":
         st.subheader("🍽️ Nutrition Facts for Each Ingredient (per 100g)")
 
         # Convert nutrition info to a DataFrame for better display
+        import pandas as pd
+
         nutrition_df = pd.DataFrame.from_dict(display_info, orient='index').reset_index()
         nutrition_df.columns = ["Ingredient", "Carbohydrate (g)", "Energy (kcal)", "Protein (g)", "Fat (g)"]
 
@@ -242,18 +229,57 @@ if __name__ == "__main__":
         combining data and analysis to provide you with a richer understanding of your food choices.
         """)
 
-        # Generate augmented nutrition information only if not already generated
-        if 'nutrition_augmentation' not in st.session_state.current_analysis:
-            with st.spinner("Generating augmented nutrition information..."):
-                nutrition_augmentation = agent2_nutrition_augmentation(
-                    st.session_state.current_analysis['encoded_image'], 
-                    nutrition_info, 
-                    ingredients
-                )
-                st.session_state.current_analysis['nutrition_augmentation'] = nutrition_augmentation
-
-        # Display the stored augmented information
-        st.markdown(f"""{st.session_state.current_analysis['nutrition_augmentation']}""")
+        # Generate augmented nutrition information only if not already generated,
+        # rendering it progressively as the tokens arrive. If the latency budget runs out,
+        # degrade to the USDA facts above and offer a retry instead of retrying on every rerun.
+        # The first attempt shares the upload's budget with agent1; a retry gets a fresh one.
+        augmentation_pending = (
+            'nutrition_augmentation' not in st.session_state.current_analysis
+            and not st.session_state.current_analysis.get('augmentation_failed')
+        )
+        if augmentation_pending:
+            augmentation_budget = st.session_state.current_analysis.pop('latency_budget', None) or LatencyBudget()
+        if augmentation_pending and ANALYSIS_MODE == "structured":
+            # One call returns the markdown, the nutrition totals and the summary used when saving
+            try:
+                with st.spinner("Analyzing your meal..."), latency_budget(augmentation_budget):
+                    analysis = agent_structured_analysis(
+                        st.session_state.current_analysis['encoded_image'], 
+                        nutrition_info, 
+                        ingredients,
+                        st.session_state.current_analysis['mime_type']
+                    )
+                st.session_state.current_analysis['nutrition_augmentation'] = analysis['markdown']
+                st.session_state.current_analysis['final_nutrition_info'] = analysis['totals']
+                st.session_state.current_analysis['text_summary'] = analysis['summary']
+                get_result_cache().put(image_bytes, ingredients, analysis['markdown'], analysis['totals'], analysis['summary'])
+                st.markdown(analysis['markdown'])
+            except Exception as e:
+                print(f"Augmentation unavailable: {e}")
+                st.session_state.current_analysis['augmentation_failed'] = True
+        elif augmentation_pending:
+            try:
+                with latency_budget(augmentation_budget):
+                    nutrition_augmentation = st.write_stream(agent2_nutrition_augmentation_stream(
+                        st.session_state.current_analysis['encoded_image'], 
+                        nutrition_info, 
+                        ingredients,
+                        st.session_state.current_analysis['mime_type']
+                    ))
+                st.session_state.current_analysis['nutrition_augmentation'] = nutrition_augmentation.strip()
+                get_result_cache().put(image_bytes, ingredients, st.session_state.current_analysis['nutrition_augmentation'])
+            except Exception as e:
+                print(f"Augmentation unavailable: {e}")
+                st.session_state.current_analysis['augmentation_failed'] = True
+        elif 'nutrition_augmentation' in st.session_state.current_analysis:
+            # Display the stored augmented information
+            st.markdown(f"""{st.session_state.current_analysis['nutrition_augmentation']}""")
+
+        if st.session_state.current_analysis.get('augmentation_failed'):
+            st.warning("Augmented nutrition information is taking too long right now. The USDA nutrition facts above are still available; retry to save the analysis.")
+            if st.button("Retry augmented analysis"):
+                del st.session_state.current_analysis['augmentation_failed']
+                st.rerun()
 
 
 
@@ -273,17 +299,33 @@ if __name__ == "__main__":
         if st.session_state.get('connected', False):
             email = st.session_state['user_info'].get('email')
             
-            # Add a save button
-            if st.button("Save Analysis"):
+            # Totals are only saved from the augmented analysis; per-100g USDA facts are not a meal
+            augmented = 'nutrition_augmentation' in st.session_state.current_analysis
+            if st.button(
+                "Save Analysis",
+                disabled=not augmented,
+                help=None if augmented else "Available once the augmented nutrition information is ready",
+            ):
                 try:
                     # Use stored file for saving
                     uploaded_file = st.session_state.current_analysis['uploaded_file']
                     uploaded_file.seek(0)
                     image_data = uploaded_file.read()
                     
-                    nutrition_augmentation = st.session_state.current_analysis['nutrition_augmentation']
-                    final_nutrition_info = agent3_parse_nutrition(nutrition_augmentation)
-                    text_summary = agent4_create_summary(nutrition_augmentation)
+                    if 'final_nutrition_info' in st.session_state.current_analysis:
+                        # Already produced by the structured analysis call
+                        final_nutrition_info = st.session_state.current_analysis['final_nutrition_info']
+                        text_summary = st.session_state.current_analysis['text_summary']
+                    else:
+                        nutrition_augmentation = st.session_state.current_analysis['nutrition_augmentation']
+                        with latency_budget(LatencyBudget()):
+                            final_nutrition_info, text_summary = run_save_agents(nutrition_augmentation)
+                        st.session_state.current_analysis['final_nutrition_info'] = final_nutrition_info
+                        st.session_state.current_analysis['text_summary'] = text_summary
+                        get_result_cache().put(
+                            image_data, st.session_state.current_analysis['ingredients'],
+                            nutrition_augmentation, final_nutrition_info, text_summary
+                        )
                     
                     # Create MongoDB instance and save
                     mongo = MongoDB()
@@ -1,35 +1,50 @@
 import os
-from openai import OpenAI
+from openai_client import get_client
 from dotenv import load_dotenv
-import streamlit as st
 import json
+from pipeline import AgentPipeline
+from resilience import resilient_call
+from nutrition_parser import parse_summary_table, record_parse, fallback_rate, validate
 
 load_dotenv()
-api_key = st.secrets["general"]["OPENAI_API_KEY"]
 
-def agent1_food_image_caption(encoded_image: str) -> str:
+# Per-call timeout in seconds for agents run through an AgentPipeline
+AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "60"))
+# Vision detail level for image inputs: "low", "high" or "auto"
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "auto")
+# "chain" runs agent2 then agent3/agent4 on save; "structured" gets everything from one agent_structured_analysis call
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "chain")
+
+def image_content(encoded_image: str, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL) -> dict:
+    """
+    Build the image_url message part for a base64 encoded image.
+    """
+    return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_image}", "detail": detail}}
+
+def agent1_food_image_caption(encoded_image: str, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL) -> str:
     """
     Take the food image (base64 encoded) and prompt (which ask to describe the food component in the image) and return the caption.
     """
-    client = OpenAI(api_key=api_key)
+    client = get_client()
 
 
     prompt = "List the major ingredients you can visually identify in the food item shown, separated by commas. Each ingredient should be described in simple terms (e.g., raw salmon, white rice). Do not include the dish name, preparation methods, quantities, or any additional commentary. Avoid using brackets, quotes, or special formatting. Example output format: raw salmon, white rice, cucumber, sesame seeds. Note: If the image is unclear or the food is unidentifiable, your response should be a simple string 'False'."
 
     try:
-        response = client.chat.completions.create(
+        response = resilient_call("agent1", lambda timeout: client.chat.completions.create(
             model="gpt-4o-mini", 
             messages=[
                 {
                     "role": "user",
                     "content": [
                         {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}}
+                        image_content(encoded_image, mime_type, detail)
                     ]
                 }
             ],
-            max_tokens=100
-        )
+            max_tokens=100,
+            timeout=timeout
+        ))
 
         ingredients_str = response.choices[0].message.content.strip()
         ingredients = [item.strip() for item in ingredients_str.split(',')]
@@ -38,13 +53,10 @@ def agent1_food_image_caption(encoded_image: str) -> str:
         raise Exception(f"Error during API call: {str(e)}")
 
 
-def agent2_nutrition_augmentation(encoded_image: str, nutrition_info: dict, ingredients: list) -> str:
+def agent2_messages(encoded_image: str, nutrition_info: dict, ingredients: list, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL) -> list:
     """
-    Take the nutrition information and augment it with additional details.
+    Build the chat messages for agent2 (image plus USDA nutrition facts), shared by the blocking and streaming variants.
     """
-    # Step 1: Initialize the OpenAI client
-    client = OpenAI(api_key=api_key)
-    # Step 2: Prompt
 
 
     # prompt = "The above nutrition facts, it describe the ingredient's nutrition per 100g. Can you then estimate the total nutrition info for the food in the provided image, based on the nutrition facts i provided to you, and also your own knowledge from your database, if you identified this food from your database, you can also directly use the information their. Simply return the nutrition info in a nice readable str format, make it concise, and easy to read. If you need to use scratch pad, you can use the scratch pad below to do your calculation. But keep the output clean(dont explicitly show our provided nutrition facts in response), especially provide a Summary Section in the end"
@@ -151,32 +163,63 @@ def agent2_nutrition_augmentation(encoded_image: str, nutrition_info: dict, ingr
 
             """
 
-    # Step 3: Return the augmented nutrition information
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                image_content(encoded_image, mime_type, detail)
+            ]
+        }
+    ]
+
+def agent2_nutrition_augmentation(encoded_image: str, nutrition_info: dict, ingredients: list, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL) -> str:
+    """
+    Take the nutrition information and augment it with additional details.
+    """
+    client = get_client()
+
     try:
-        response = client.chat.completions.create(
+        response = resilient_call("agent2", lambda timeout: client.chat.completions.create(
             model="gpt-4o-mini", 
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}}
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
+            messages=agent2_messages(encoded_image, nutrition_info, ingredients, mime_type, detail),
+            max_tokens=1000,
+            timeout=timeout
+        ))
 
         augmented_nutrition_info = response.choices[0].message.content.strip()
         return augmented_nutrition_info
     except Exception as e:
         raise Exception(f"Error during API call: {str(e)}")
 
+def agent2_nutrition_augmentation_stream(encoded_image: str, nutrition_info: dict, ingredients: list, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL):
+    """
+    Streaming variant of agent2_nutrition_augmentation.
+    Yields markdown chunks as they arrive so the page can render progressively; callers join them for the full text.
+    """
+    client = get_client()
+
+    try:
+        stream = resilient_call("agent2_stream", lambda timeout: client.chat.completions.create(
+            model="gpt-4o-mini", 
+            messages=agent2_messages(encoded_image, nutrition_info, ingredients, mime_type, detail),
+            max_tokens=1000,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout
+        ), stream=True)
+
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        raise Exception(f"Error during API call: {str(e)}")
+
 def agent3_parse_nutrition(agent2_response: str) -> list:
     """
     Parse the nutrition summary table from agent2's response and return it as a structured list.
     """
-    client = OpenAI(api_key=api_key)
+    client = get_client()
     
     prompt = """
     Extract the numerical ranges from the Summary section's nutrition table and convert them to a JSON format.
@@ -207,7 +250,7 @@ def agent3_parse_nutrition(agent2_response: str) -> list:
     """
 
     try:
-        response = client.chat.completions.create(
+        response = resilient_call("agent3", lambda timeout: client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -216,20 +259,14 @@ def agent3_parse_nutrition(agent2_response: str) -> list:
                 }
             ],
             max_tokens=300,
-            response_format={ "type": "json_object" }
-        )
-        
-        # Print raw response for debugging
-        print("\nRaw GPT Response:")
-        print(response.choices[0].message.content.strip())
+            response_format={ "type": "json_object" },
+            timeout=timeout
+        ))
         
         # Parse the JSON response
         parsed_response = json.loads(response.choices[0].message.content.strip())
         nutrition_list = parsed_response.get('data', [])
         
-        print("\nAgent3 Output:")
-        print(json.dumps(nutrition_list, indent=2))
-        
         return nutrition_list
         
     except Exception as e:
@@ -240,7 +277,7 @@ def agent4_create_summary(agent2_response: str) -> str:
     Create a concise, informative summary of the nutritional analysis from agent2's response.
     Returns a brief, professional summary focusing on key nutritional aspects.
     """
-    client = OpenAI(api_key=api_key)
+    client = get_client()
     
     prompt = """
     As a professional nutritionist, create a brief, informative summary of this meal's nutritional analysis.
@@ -260,7 +297,7 @@ def agent4_create_summary(agent2_response: str) -> str:
     """
 
     try:
-        response = client.chat.completions.create(
+        response = resilient_call("agent4", lambda timeout: client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -268,11 +305,111 @@ def agent4_create_summary(agent2_response: str) -> str:
                     "content": f"{prompt}\n\nNutritional analysis to summarize:\n{agent2_response}"
                 }
             ],
-            max_tokens=200
-        )
+            max_tokens=200,
+            timeout=timeout
+        ))
         
         summary = response.choices[0].message.content.strip()
         return summary
         
     except Exception as e:
-        raise Exception(f"Error creating nutritional summary: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error creating nutritional summary: {str(e)}")
+
+ANALYSIS_SCHEMA = {
+    "name": "food_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "ingredients": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "weight_g_min": {"type": "number"},
+                        "weight_g_max": {"type": "number"}
+                    },
+                    "required": ["name", "weight_g_min", "weight_g_max"],
+                    "additionalProperties": False
+                }
+            },
+            "totals": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "nutrient": {"type": "string", "enum": ["energy", "protein", "fat", "carbs"]},
+                        "min": {"type": "number"},
+                        "max": {"type": "number"}
+                    },
+                    "required": ["nutrient", "min", "max"],
+                    "additionalProperties": False
+                }
+            },
+            "markdown": {"type": "string"},
+            "summary": {"type": "string"}
+        },
+        "required": ["ingredients", "totals", "markdown", "summary"],
+        "additionalProperties": False
+    }
+}
+
+def agent_structured_analysis(encoded_image: str, nutrition_info: dict, ingredients: list, mime_type: str = "image/jpeg", detail: str = IMAGE_DETAIL) -> dict:
+    """
+    Do the work of agent2, agent3 and agent4 in one vision call with a JSON-schema response.
+    Returns a dict with "ingredients" (estimated weights), "totals" (agent3 format), "markdown" (agent2 text) and "summary" (agent4 text).
+    """
+    client = get_client()
+
+    messages = agent2_messages(encoded_image, nutrition_info, ingredients, mime_type, detail)
+    messages[0]["content"].append({"type": "text", "text": """
+            Return your answer as a JSON object with these fields:
+            ingredients: each visible ingredient with the lower and upper bound of its estimated weight in grams
+            totals: the Summary table ranges for energy (kcal), protein (g), fat (g) and carbs (g), numbers only, no units
+            markdown: the full response for the user, formatted exactly as described above
+            summary: a brief plain-text summary in 3-4 sentences, starting with a one-sentence overview of the dish, then the macronutrient distribution and any notable nutritional characteristics, professional but conversational, facts rather than recommendations
+            """})
+
+    try:
+        response = resilient_call("agent_structured", lambda timeout: client.chat.completions.create(
+            model="gpt-4o-mini", 
+            messages=messages,
+            max_tokens=1500,
+            response_format={"type": "json_schema", "json_schema": ANALYSIS_SCHEMA},
+            timeout=timeout
+        ))
+
+        analysis = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        raise Exception(f"Error during API call: {str(e)}")
+
+    analysis["markdown"] = analysis["markdown"].strip()
+    analysis["summary"] = analysis["summary"].strip()
+    if not validate(analysis["totals"]):
+        # Inconsistent totals: fall back to the Summary table of the markdown
+        analysis["totals"] = parse_nutrition(analysis["markdown"])
+    return analysis
+
+def parse_nutrition(agent2_response: str) -> list:
+    """
+    Parse the nutrition summary from agent2's response locally, calling agent3 only if the local parse fails validation.
+    """
+    nutrition_list = parse_summary_table(agent2_response)
+    if nutrition_list is not None:
+        record_parse("local")
+        return nutrition_list
+    record_parse("fallback")
+    print(f"Local nutrition parse failed, falling back to agent3 (fallback rate {fallback_rate():.1%})")
+    return agent3_parse_nutrition(agent2_response)
+
+def run_save_agents(agent2_response: str) -> tuple:
+    """
+    Run nutrition parsing (local, with agent3 as fallback) and agent4 (summary) concurrently, since both only need agent2's response.
+    Returns (final_nutrition_info, text_summary); the caller waits only for the slower of the two.
+    """
+    pipeline = AgentPipeline()
+    pipeline.add("final_nutrition_info", parse_nutrition, args=(agent2_response,), timeout=AGENT_TIMEOUT)
+    pipeline.add("text_summary", agent4_create_summary, args=(agent2_response,), timeout=AGENT_TIMEOUT)
+    results = pipeline.run()
+    return results["final_nutrition_info"], results["text_summary"]
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents import (
+    ANALYSIS_MODE,
+    agent1_food_image_caption,
+    agent2_nutrition_augmentation,
+    agent_structured_analysis,
+    run_save_agents,
+)
+from preprocess import prepare_image
+from resilience import LatencyBudget, latency_budget
+from result_cache import ResultCache, content_hash
+from vector_store import VECTOR_BACKEND, get_vector_store
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def find_images(input_dir: str) -> list:
+    """All JPG/PNG files under input_dir, in a stable order"""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def read_manifest(path: str) -> list:
+    """One image path per line; relative paths are relative to the manifest, blank lines and # comments are ignored"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+
+def load_checkpoint(path: str) -> dict:
+    """Records already written to the checkpoint, keyed by image path; a truncated last line is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["path"]] = record
+    return done
+
+
+def analyze_image(path: str, db, result_cache: ResultCache, mode: str = ANALYSIS_MODE) -> dict:
+    """
+    Run the same pipeline as the uploader in Home.py on one image file:
+    prepare_image -> agent1 -> retrieval -> agent2 -> nutrition parsing and agent4 (or one structured call).
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        image_bytes = f.read()
+        encoded_image, mime_type, image_stats = prepare_image(f)
+
+    with latency_budget(LatencyBudget()):
+        cached_result = result_cache.get(image_bytes)
+        if cached_result is not None:
+            ingredients = cached_result["ingredients"]
+        else:
+            ingredients = agent1_food_image_caption(encoded_image, mime_type)
+        if ingredients[0] == "False":
+            raise ValueError("Could not identify the food in the image")
+        if cached_result is None:
+            # Only cache identified food, like Home.py, so a one-off failure can be retried
+            result_cache.put(image_bytes, ingredients)
+
+        nutrition_info = {}
+        for ingredient, similar_doc in zip(ingredients, db.batch_similarity_search(ingredients, k=1)):
+            if similar_doc:
+                nutrition_info[similar_doc[0].page_content] = similar_doc[0].metadata
+
+        cached = cached_result or {}
+        if cached.get("nutrition_augmentation") and cached.get("totals") is not None:
+            # A repeat image: reuse the stored analysis and totals instead of calling the model again
+            nutrition_augmentation = cached["nutrition_augmentation"]
+            final_nutrition_info, text_summary = cached["totals"], cached["summary"]
+        elif mode == "structured":
+            analysis = agent_structured_analysis(encoded_image, nutrition_info, ingredients, mime_type)
+            nutrition_augmentation = analysis["markdown"]
+            final_nutrition_info, text_summary = analysis["totals"], analysis["summary"]
+        else:
+            nutrition_augmentation = cached.get("nutrition_augmentation")
+            if not nutrition_augmentation:
+                nutrition_augmentation = agent2_nutrition_augmentation(encoded_image, nutrition_info, ingredients, mime_type)
+            final_nutrition_info, text_summary = run_save_agents(nutrition_augmentation)
+        result_cache.put(image_bytes, ingredients, nutrition_augmentation, final_nutrition_info, text_summary)
+
+    return {
+        "path": path,
+        "sha256": content_hash(image_bytes),
+        "status": "ok",
+        "ingredients": ingredients,
+        "nutrition_info": nutrition_info,
+        "nutrition_augmentation": nutrition_augmentation,
+        "final_nutrition_info": final_nutrition_info,
+        "text_summary": text_summary,
+        "image_stats": image_stats,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def save_to_history(record: dict, email: str):
+    """Append a successful result to the user's food history, like the Save Analysis button"""
+    from mongodb import MongoDB
+
+    with open(record["path"], "rb") as f:
+        image_data = f.read()
+    MongoDB().save_analysis(
+        email=email,
+        image_data=image_data,
+        ingredients=record["ingredients"],
+        final_nutrition_info=record["final_nutrition_info"],
+        text_summary=record["text_summary"],
+    )
+
+
+def write_output(records: list, output: str):
+    """Write the records as JSONL, or as Parquet when output ends in .parquet"""
+    if output.endswith(".parquet"):
+        import pandas as pd
+
+        frame = pd.DataFrame(records)
+        # Nested fields are stored as JSON strings so every row has the same flat schema
+        for column in ("ingredients", "nutrition_info", "final_nutrition_info", "image_stats"):
+            if column in frame:
+                frame[column] = frame[column].apply(lambda value: json.dumps(value) if value is not None else None)
+        frame.to_parquet(output, index=False)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+
+def run_batch(paths: list, output: str, checkpoint: str, workers: int = 4, email: str = None,
+              backend: str = VECTOR_BACKEND, retry_failed: bool = False) -> dict:
+    """
+    Analyze every image in paths with at most workers images in flight.
+    Each finished image is appended to the checkpoint immediately, so an interrupted run resumes
+    where it stopped. The output file is rewritten from the checkpoint at the end.
+    """
+    done = load_checkpoint(checkpoint)
+    if retry_failed:
+        done = {path: record for path, record in done.items() if record["status"] == "ok"}
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} images, {len(paths) - len(todo)} already done, {len(todo)} to analyze with {workers} workers")
+
+    db = get_vector_store(backend)
+    result_cache = ResultCache()
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    start = time.perf_counter()
+    with open(checkpoint, "a", encoding="utf-8") as checkpoint_file, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_image, path, db, result_cache): path for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                record = future.result()
+                if email:
+                    save_to_history(record, email)
+            except Exception as e:
+                record = {"path": path, "status": "error", "error": str(e)}
+            counts[record["status"]] += 1
+            with write_lock:
+                checkpoint_file.write(json.dumps(record) + "\n")
+                checkpoint_file.flush()
+            done[path] = record
+            finished = counts["ok"] + counts["error"]
+            elapsed = time.perf_counter() - start
+            print(f"[{finished}/{len(todo)}] {record['status']:<5} {path} ({finished / elapsed * 60:.1f} images/min)")
+
+    elapsed = time.perf_counter() - start
+    write_output([done[path] for path in paths if path in done], output)
+    report = {
+        "analyzed": counts["ok"],
+        "failed": counts["error"],
+        "skipped": len(paths) - len(todo),
+        "seconds": round(elapsed, 1),
+        "images_per_minute": round((counts["ok"] + counts["error"]) / elapsed * 60, 2) if todo else 0.0,
+    }
+    print(f"Batch finished: {report}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of food images without the web app.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="Directory searched recursively for JPG/PNG images")
+    source.add_argument("--manifest", help="Text file with one image path per line")
+    parser.add_argument("--output", required=True, help="Results file, .jsonl or .parquet")
+    parser.add_argument("--checkpoint", help="Progress file used to resume (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Images analyzed concurrently")
+    parser.add_argument("--email", help="Also save each result to this user's food history in MongoDB")
+    parser.add_argument("--backend", default=VECTOR_BACKEND, help="Vector store backend")
+    parser.add_argument("--retry-failed", action="store_true", help="Analyze images that failed in a previous run again")
+    args = parser.parse_args()
+
+    paths = find_images(args.input_dir) if args.input_dir else read_manifest(args.manifest)
+    checkpoint = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    run_batch(paths, args.output, checkpoint, args.workers, args.email, args.backend, args.retry_failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import statistics
+import time
+
+from langchain_chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from embedding_cache import CachedEmbeddings
+from numpy_index import load_numpy_index
+from openai_client import embeddings_kwargs
+
+DEFAULT_QUERIES = [
+    "raw salmon", "white rice", "pineapple", "cucumber", "seaweed", "sesame seeds",
+    "avocado", "scrambled eggs", "whole wheat bread", "cheddar cheese", "grilled chicken breast", "broccoli",
+]
+
+
+def time_calls(fn, repeats):
+    """Run fn repeats times and return per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<16} p50 {statistics.median(latencies):8.3f} ms   p95 {p95:8.3f} ms   mean {statistics.mean(latencies):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chroma and NumPy exact search latency on the food DB.")
+    parser.add_argument("--chroma-dir", default="../data/food_db_cloud/vector_db_json")
+    parser.add_argument("--numpy-dir", default="../data/food_db_cloud/numpy_index")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("-k", type=int, default=1)
+    args = parser.parse_args()
+
+    # Embeddings are computed once up front so only the index lookups are timed
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large", **embeddings_kwargs()), model="text-embedding-3-large")
+    query_vectors = embeddings.embed_documents(DEFAULT_QUERIES)
+
+    chroma = Chroma(collection_name="food_items_collection", persist_directory=args.chroma_dir)
+    numpy_index = load_numpy_index(args.numpy_dir)
+    print(f"{len(numpy_index)} vectors, {len(DEFAULT_QUERIES)} queries, k={args.k}, {args.repeats} repeats")
+
+    def chroma_sequential():
+        return [chroma.similarity_search_by_vector(vector, k=args.k) for vector in query_vectors]
+
+    def chroma_batch():
+        return chroma._collection.query(query_embeddings=query_vectors, n_results=args.k)
+
+    def numpy_batch():
+        return numpy_index.batch_similarity_search_by_vector(query_vectors, k=args.k)
+
+    summarize("chroma", time_calls(chroma_sequential, args.repeats))
+    summarize("chroma batch", time_calls(chroma_batch, args.repeats))
+    summarize("numpy batch", time_calls(numpy_batch, args.repeats))
+
+    chroma_top = [docs[0].page_content for docs in chroma_sequential()]
+    numpy_top = [docs[0].page_content for docs in numpy_batch()]
+    agreement = sum(a == b for a, b in zip(chroma_top, numpy_top)) / len(DEFAULT_QUERIES)
+    print(f"top-1 agreement between Chroma (approximate) and NumPy (exact): {agreement:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import metrics
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "../data/cache/embeddings.sqlite")
+MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share an entry"""
+    return " ".join(text.lower().split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed cache in front of an embeddings model.
+
+    Entries are keyed by model name and normalized text, survive restarts and are
+    evicted least-recently-used once the cache holds more than max_entries vectors.
+    """
+
+    def __init__(self, embeddings, model: str, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text = ?", (self.model, key)
+                ).fetchone()
+                if row is not None:
+                    found[key] = np.frombuffer(row[0], dtype=np.float32).tolist()
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                [(now, self.model, key) for key in found]
+            )
+            self._conn.commit()
+        return found
+
+    def _store(self, vectors):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model, key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        """Embed texts, sending only the cache misses to the model in a single request"""
+        keys = [normalize_text(text) for text in texts]
+        found = self._lookup(set(keys))
+        missing = sorted(set(keys) - set(found))
+        miss_count = sum(1 for key in keys if key not in found)
+        with self._lock:
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+        if missing:
+            new_vectors = dict(zip(missing, self._embed_missing(missing)))
+            self._store(new_vectors)
+            found.update(new_vectors)
+        return [found[key] for key in keys]
+
+    def _embed_missing(self, texts):
+        """Call the model for the cache misses, recording latency and estimated tokens and cost"""
+        start = time.monotonic()
+        status = "error"
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+            status = "ok"
+            return vectors
+        finally:
+            # langchain does not expose the usage, so tokens are estimated at four characters each
+            usage = SimpleNamespace(prompt_tokens=sum(max(1, len(text) // 4) for text in texts), completion_tokens=0)
+            metrics.record_call("embeddings", time.monotonic() - start, 0.0, 0, status,
+                                model=self.model, usage=usage if status == "ok" else None)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        """Hit and miss counters since the process started"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
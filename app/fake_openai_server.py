@@ -0,0 +1,327 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Canned responses for each agent; text responses are str.format templates with the fields
+# model, prompt_tokens and request_id. Override any of them with --responses.
+DEFAULT_RESPONSES = {
+    "caption": "grilled salmon, white rice, cucumber, sesame seeds",
+    "augmentation": (
+        "**Estimated portions**\n\n"
+        "- Grilled salmon: 120 - 150 g\n"
+        "- White rice: 150 - 180 g\n"
+        "- Cucumber: 30 - 40 g\n"
+        "- Sesame seeds: 3 - 5 g\n\n"
+        "The salmon provides most of the protein and fat, while the rice supplies the carbohydrates.\n\n"
+        "**Summary**\n\n"
+        "| Nutrient | Total Estimated Values (±10%) |\n"
+        "|---|---|\n"
+        "| Energy | 493 - 611 kcal |\n"
+        "| Protein | 32 - 39 g |\n"
+        "| Fat | 25 - 32 g |\n"
+        "| Carbohydrates | 31 - 42 g |"
+    ),
+    "nutrition_json": {
+        "data": [
+            {"nutrient": "energy", "min": 493.0, "max": 611.0},
+            {"nutrient": "protein", "min": 32.0, "max": 39.0},
+            {"nutrient": "fat", "min": 25.0, "max": 32.0},
+            {"nutrient": "carbs", "min": 31.0, "max": 42.0},
+        ]
+    },
+    "summary": (
+        "This plate combines grilled salmon with white rice and cucumber for a meal of roughly 490-610 calories. "
+        "Carbohydrates, protein and fat are fairly evenly split, with the salmon contributing most of the protein and fat. "
+        "It is a protein-rich, balanced meal with a good share of omega-3 fatty acids."
+    ),
+    "structured": {
+        "ingredients": [
+            {"name": "grilled salmon", "weight_g_min": 120, "weight_g_max": 150},
+            {"name": "white rice", "weight_g_min": 150, "weight_g_max": 180},
+            {"name": "cucumber", "weight_g_min": 30, "weight_g_max": 40},
+            {"name": "sesame seeds", "weight_g_min": 3, "weight_g_max": 5},
+        ],
+        "totals": [
+            {"nutrient": "energy", "min": 493, "max": 611},
+            {"nutrient": "protein", "min": 32, "max": 39},
+            {"nutrient": "fat", "min": 25, "max": 32},
+            {"nutrient": "carbs", "min": 31, "max": 42},
+        ],
+        "markdown": "",
+        "summary": "",
+    },
+}
+
+TOKEN_RE = re.compile(r"\S+\s*|\s+")
+# Roughly what a low-detail image costs; high-detail images cost more, which this ignores
+IMAGE_TOKENS = 85
+
+
+def parse_distribution(spec: str):
+    """
+    Return a sampler for a distribution spec:
+    "0.5" (fixed), "uniform:LOW,HIGH", "normal:MEAN,STDDEV" or "lognormal:MEDIAN,SIGMA".
+    Samples are never negative.
+    """
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind)
+        return lambda: value
+    a, b = (float(value) for value in params.split(","))
+    if kind == "uniform":
+        return lambda: random.uniform(a, b)
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(a, b))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(np.log(a), b) if a > 0 else 0.0
+    raise ValueError(f"Unknown distribution {kind!r}, expected uniform, normal or lognormal")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count: about four characters per token"""
+    return max(1, len(text) // 4)
+
+
+def split_tokens(text: str) -> list:
+    """Split text into word-sized pieces for streaming; joining them gives back the text"""
+    return TOKEN_RE.findall(text)
+
+
+def message_text(messages: list) -> tuple:
+    """All text of the chat messages joined together, and the number of images they contain"""
+    parts, images = [], 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                parts.append(part["text"])
+            elif part.get("type") == "image_url":
+                images += 1
+    return "\n".join(parts), images
+
+
+def classify(body: dict, prompt: str) -> str:
+    """Which agent a chat request comes from, judged by its response format and prompt"""
+    response_format = (body.get("response_format") or {}).get("type")
+    if response_format == "json_schema":
+        return "structured"
+    if response_format == "json_object":
+        return "nutrition_json"
+    if "List the major ingredients" in prompt:
+        return "caption"
+    if "create a brief, informative summary" in prompt:
+        return "summary"
+    return "augmentation"
+
+
+def embed(text, dimensions: int) -> list:
+    """Deterministic unit vector derived from the text, so equal inputs always get equal embeddings"""
+    seed = int.from_bytes(hashlib.sha256(json.dumps(text).encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeOpenAI:
+    """Response generation and timing for the stand-in server, independent of HTTP"""
+
+    def __init__(self, responses: dict = None, latency: str = "0", token_rate: str = "0",
+                 error_rate: float = 0.0, embedding_dimensions: int = 3072):
+        self.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self.latency = parse_distribution(latency)
+        self.token_rate = parse_distribution(token_rate)
+        self.error_rate = error_rate
+        self.embedding_dimensions = embedding_dimensions
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def token_delay(self) -> float:
+        """Seconds per generated token; 0 means the whole response is available at once"""
+        rate = self.token_rate()
+        return 1.0 / rate if rate > 0 else 0.0
+
+    def completion_text(self, body: dict) -> tuple:
+        prompt, images = message_text(body.get("messages", []))
+        kind = classify(body, prompt)
+        prompt_tokens = count_tokens(prompt) + images * IMAGE_TOKENS
+        fields = {"model": body.get("model", ""), "prompt_tokens": prompt_tokens, "request_id": uuid.uuid4().hex}
+        response = self.responses[kind]
+        if kind == "structured":
+            response = dict(response)
+            response["markdown"] = response["markdown"] or self.responses["augmentation"]
+            response["summary"] = response["summary"] or self.responses["summary"]
+        if isinstance(response, str):
+            text = response.format_map(fields)
+        else:
+            text = json.dumps(response)
+        return text, prompt_tokens
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body.get("input", [])
+        # A single string, a list of strings, or token arrays
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or self.embedding_dimensions
+        data = []
+        for index, text in enumerate(inputs):
+            vector = embed(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                value = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                value = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": value})
+        prompt_tokens = sum(count_tokens(text) if isinstance(text, str) else len(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", ""),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def setup(self):
+        super().setup()
+        # One handler instance per TCP connection, however many keep-alive requests it serves
+        self.fake.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": {"message": message, "type": "fake_server_error", "code": status}})
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            models = ["gpt-4o-mini", "gpt-4o", "text-embedding-3-large", "text-embedding-ada-002"]
+            self._send_json(200, {"object": "list", "data": [{"id": model, "object": "model"} for model in models]})
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.fake.count_request()
+        time.sleep(self.fake.latency())
+        if self.fake.should_fail():
+            self._send_error(503, "Injected failure")
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat(body)
+        elif self.path.rstrip("/").endswith("/embeddings"):
+            self._send_json(200, self.fake.embeddings(body))
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def _chat(self, body: dict):
+        text, prompt_tokens = self.fake.completion_text(body)
+        tokens = split_tokens(text)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "")
+        delay = self.fake.token_delay()
+
+        if not body.get("stream"):
+            time.sleep(delay * len(tokens))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_chunk(choices, chunk_usage=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": choices, "usage": chunk_usage}
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        send_chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for token in tokens:
+            time.sleep(delay)
+            send_chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        send_chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send_chunk([], usage)
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(fake: FakeOpenAI, host: str = "127.0.0.1", port: int = 8089) -> ThreadingHTTPServer:
+    """HTTP server answering /v1/chat/completions, /v1/embeddings and /v1/models with fake"""
+    handler = type("FakeOpenAIHandler", (Handler,), {"fake": fake})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for load tests and offline runs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--responses", help="JSON file overriding the canned responses by kind "
+                                            "(caption, augmentation, nutrition_json, summary, structured)")
+    parser.add_argument("--latency", default="0", help="Seconds before each response starts, e.g. lognormal:0.8,0.4")
+    parser.add_argument("--token-rate", default="0", help="Generated tokens per second, e.g. normal:60,15; 0 is instant")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--embedding-dimensions", type=int, default=3072)
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    fake = FakeOpenAI(responses, args.latency, args.token_rate, args.error_rate, args.embedding_dimensions)
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake OpenAI server on http://{args.host}:{args.port}/v1 (set MODEL_BACKEND=local)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Served {fake.requests} requests over {fake.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
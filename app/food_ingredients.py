@@ -1,5 +1,5 @@
 from preprocess import vector_db
-from usda_api import get_food_nutrition_info
+from usda_client import get_usda_client
 from postprocess import filter_nutrition_data
 
 
@@ -24,8 +24,11 @@ if __name__ == "__main__":
 
     filtered_nutrition_info = []
 
-    for api_query in api_querys:
-        nutrition_info = get_food_nutrition_info(api_query)
+    # All ingredients are looked up concurrently through the pooled, cached client
+    for api_query, nutrition_info in zip(api_querys, get_usda_client().search_many(api_querys)):
+        if isinstance(nutrition_info, Exception):
+            print(f"No USDA data for {api_query}: {nutrition_info}")
+            continue
         filtered_nutrition_info.extend(filter_nutrition_data(nutrition_info))
     print(filtered_nutrition_info)
 
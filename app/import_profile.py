@@ -0,0 +1,83 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Import-time budget in milliseconds for each entry point, and heavy packages it must not load
+# at import (they belong on first use). streamlit itself is allowed: the app cannot start without it.
+ENTRY_POINTS = {
+    "Home": (2500, ("langchain_chroma", "chromadb", "langchain_openai", "openai", "boto3", "streamlit_google_auth")),
+    "agents": (150, ("openai", "httpx", "streamlit")),
+    "vector_store": (1500, ("langchain_chroma", "chromadb", "langchain_openai", "boto3", "openai")),
+    "preprocess": (300, ("pandas", "langchain_chroma", "langchain_openai", "boto3", "PIL", "ijson", "streamlit")),
+    "postprocess": (50, ()),
+    "result_cache": (50, ("PIL",)),
+    "nutrient_store": (300, ()),
+    "batch_analyze": (2000, ("pandas", "langchain_chroma", "chromadb", "boto3", "openai")),
+}
+
+
+def profile_import(module: str) -> tuple:
+    """
+    Import module in a fresh interpreter with -X importtime.
+    Returns (total milliseconds, set of every module loaded).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    total_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        loaded.add(name.strip())
+        # The module's own unindented line covers everything it imports, but not interpreter startup
+        if name.strip() == module and not name.startswith("  "):
+            total_us = int(cumulative)
+    return total_us / 1000, loaded
+
+
+def check(modules, repeats: int = 3, scale: float = 1.0) -> list:
+    """Profile each entry point (best of repeats) and return a list of budget and lazy-import violations"""
+    failures = []
+    for module in modules:
+        budget_ms, forbidden = ENTRY_POINTS[module]
+        try:
+            runs = [profile_import(module) for _ in range(repeats)]
+        except RuntimeError as e:
+            failures.append(str(e))
+            print(f"{module:<16} import failed")
+            continue
+        ms = min(run[0] for run in runs)
+        eager = sorted(name for name in forbidden if name in runs[0][1])
+        status = "ok"
+        if ms > budget_ms * scale:
+            failures.append(f"{module} imports in {ms:.0f} ms, budget {budget_ms * scale:.0f} ms")
+            status = "SLOW"
+        if eager:
+            failures.append(f"{module} loads {', '.join(eager)} at import")
+            status = "EAGER"
+        print(f"{module:<16} {ms:8.1f} ms   budget {budget_ms * scale:6.0f} ms   {status}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of each entry point against its budget.")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Entry points to check (default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="Imports per module; the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on slow CI machines")
+    args = parser.parse_args()
+
+    failures = check(args.modules, args.repeats, args.scale)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
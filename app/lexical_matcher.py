@@ -0,0 +1,182 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from itertools import groupby
+
+# Minimum confidence (0-1) for a lexical match to skip the embedding call. On the labelled set in
+# tests/test_lexical_matcher.py wrong matches score at most 0.8 and choose_threshold gives 1.0
+LEXICAL_THRESHOLD = float(os.getenv("LEXICAL_THRESHOLD", "0.9"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+CANDIDATES = 5
+# A query token counts as covered by a description token this similar, e.g. "apple" by "apples"
+TOKEN_MATCH = 0.7
+# Confidence is multiplied by this for every description token the query does not mention
+EXTRA_TOKEN_DECAY = 0.8
+# USDA qualifiers that do not change what a food is or its nutrients much. "raw" and "fresh" are not
+# among them: "Rice, white, ..., raw" is dry rice at about 3x the energy of cooked rice
+NEUTRAL_TOKENS = {
+    "with", "without", "and", "or", "of", "in", "peel", "skin", "all", "variety",
+    "regular", "commercial", "plain", "grain", "long", "enriched", "unenriched", "nfs", "ns",
+}
+
+
+def singular(token: str) -> str:
+    """Crude English singular, enough for USDA descriptions: "apples", "berries", "tomatoes", "peaches" """
+    if len(token) <= 3 or not token.endswith("s") or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return token[:-2]
+    return token[:-1]
+
+
+def tokenize(text: str) -> list:
+    return [singular(token) for token in re.findall(r"[a-z0-9]+", text.lower())]
+
+
+def canonical_key(text: str) -> str:
+    """
+    Order- and plural-insensitive form, so "white rice" and "Rice, white" share a key, as do
+    "Salmon (raw)", "raw salmon" and "Raw Salmons". Also the ingredient key of match_cache.
+    """
+    return " ".join(sorted(tokenize(text)))
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """Dice coefficient of the character trigrams of two canonical keys"""
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+def coverage_confidence(query_tokens: list, description_tokens: list) -> float:
+    """
+    How well a description answers a query: the mean best trigram similarity of each query token
+    to a description token, decayed for every description token that is neither in the query nor a
+    neutral qualifier. "raw cucumber" scores 1.0 against "Cucumber, with peel, raw" but 0.8 against
+    "Cucumber, peeled, raw", and "apple" only 0.64 against "Apple juice, canned".
+    """
+    if not query_tokens or not description_tokens:
+        return 0.0
+    best = [max(trigram_similarity(q, d) for d in description_tokens) for q in query_tokens]
+    coverage = sum(score if score >= TOKEN_MATCH else 0.0 for score in best) / len(query_tokens)
+    extra = sum(
+        1 for d in set(description_tokens)
+        if d not in NEUTRAL_TOKENS and max(trigram_similarity(d, q) for q in query_tokens) < TOKEN_MATCH
+    )
+    return coverage * EXTRA_TOKEN_DECAY ** extra
+
+
+class LexicalMatcher:
+    """
+    In-memory lexical index over the USDA descriptions.
+
+    A normalized exact match is returned with confidence 1.0. Otherwise the top BM25
+    candidates are rescored by coverage_confidence and the best one is returned with
+    that score as its confidence. Callers fall back to vector search below the threshold.
+    """
+
+    def __init__(self, documents, metadatas, threshold: float = LEXICAL_THRESHOLD):
+        self.documents = documents
+        self.metadatas = metadatas
+        self.threshold = threshold
+        self.lexical_hits = 0
+        self.vector_fallbacks = 0
+        self._lock = threading.Lock()
+
+        self._keys = [canonical_key(text) for text in documents]
+        self._exact = {}
+        for i, key in enumerate(self._keys):
+            self._exact.setdefault(key, i)
+
+        self._postings = defaultdict(list)
+        self._lengths = []
+        for i, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self._lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self._postings[token].append((i, tf))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def _bm25_candidates(self, tokens):
+        scores = defaultdict(float)
+        n_docs = len(self.documents)
+        for token in set(tokens):
+            postings = self._postings.get(token, [])
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = 1 - BM25_B + BM25_B * self._lengths[i] / self._avg_length
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return sorted(scores, key=lambda i: (-scores[i], i))[:CANDIDATES]
+
+    def best_match(self, query: str):
+        """Return (index, confidence) of the best lexical match, or (None, 0.0)"""
+        key = canonical_key(query)
+        if key in self._exact:
+            return self._exact[key], 1.0
+        query_tokens = key.split()
+        best, best_score = None, 0.0
+        for i in self._bm25_candidates(query_tokens):
+            score = coverage_confidence(query_tokens, self._keys[i].split())
+            if score > best_score:
+                best, best_score = i, score
+        return best, best_score
+
+    def match(self, query: str):
+        """Return the matching Document if the lexical match is confident enough, otherwise None"""
+        index, confidence = self.best_match(query)
+        confident = index is not None and confidence >= self.threshold
+        with self._lock:
+            if confident:
+                self.lexical_hits += 1
+            else:
+                self.vector_fallbacks += 1
+        if not confident:
+            return None
+        from langchain_core.documents import Document
+
+        return Document(page_content=self.documents[index], metadata=self.metadatas[index])
+
+    def stats(self):
+        """How often each retrieval path was taken since the process started"""
+        total = self.lexical_hits + self.vector_fallbacks
+        return {
+            "lexical_hits": self.lexical_hits,
+            "vector_fallbacks": self.vector_fallbacks,
+            "lexical_rate": round(self.lexical_hits / total, 3) if total else 0.0,
+        }
+
+
+def choose_threshold(matcher: LexicalMatcher, labels, min_precision: float = 1.0) -> float:
+    """
+    Lowest confidence threshold at which the lexical hits on labels, (query, expected description)
+    pairs, are at least min_precision correct. Returns 1.0 if no threshold below it qualifies.
+    """
+    scored = []
+    for query, expected in labels:
+        index, confidence = matcher.best_match(query)
+        if index is not None:
+            scored.append((confidence, matcher.documents[index] == expected))
+    scored.sort(key=lambda item: -item[0])
+
+    threshold, hits, correct = 1.0, 0, 0
+    # Ties are accepted or rejected together, since one threshold cannot split them
+    for confidence, group in groupby(scored, key=lambda item: item[0]):
+        for _, ok in group:
+            hits += 1
+            correct += ok
+        if correct / hits >= min_precision:
+            threshold = confidence
+    return threshold
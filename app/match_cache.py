@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from lexical_matcher import canonical_key
+
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", str(24 * 3600)))
+MATCH_CACHE_MAX_ENTRIES = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "10000"))
+
+
+class MatchCache:
+    """
+    Process-wide ingredient -> USDA match cache shared by every user.
+
+    Entries expire after ttl seconds, the least recently used are evicted beyond
+    max_entries, and everything is dropped when the index version changes.
+    """
+
+    def __init__(self, ttl: float = MATCH_CACHE_TTL, max_entries: int = MATCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, ingredient: str, version):
+        key = canonical_key(ingredient)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, ingredient: str, docs, version):
+        key = canonical_key(ingredient)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), docs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+        }
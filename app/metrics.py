@@ -0,0 +1,199 @@
+import bisect
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Log one JSON line per model call to stdout
+METRICS_JSON_LOGS = os.getenv("METRICS_JSON_LOGS", "1") == "1"
+# If set, the Prometheus text format is rewritten to this path after each call (node_exporter textfile collector)
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+# USD per 1M tokens as (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+# Set by whoever schedules a call (e.g. AgentPipeline) to the time it became ready to run
+call_ready_at = contextvars.ContextVar("call_ready_at", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost; dated model names such as gpt-4o-2024-08-06 use their base model's price"""
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(name):
+            prompt_price, completion_price = MODEL_PRICES[name]
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return 0.0
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: tuple) -> str:
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}" if labels else ""
+
+
+class MetricsRegistry:
+    """In-process counters and histograms keyed by metric name and label set"""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, help: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, help: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help))
+            self._histograms.setdefault(key, Histogram()).observe(value)
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                     "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts))}
+                    for (name, labels), h in sorted(self._histograms.items())
+                ],
+            }
+
+
+registry = MetricsRegistry()
+
+
+_textfile_lock = threading.Lock()
+
+
+def write_textfile(path: str):
+    """Atomically write the registry in Prometheus text format; concurrent writers take turns"""
+    with _textfile_lock:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(registry.to_prometheus())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def record_usage(agent: str, model: str, usage):
+    """Record token usage and estimated cost for a model response (usage is the OpenAI usage object)"""
+    if usage is None:
+        return {}
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    registry.inc("food_ai_agent_tokens_total", prompt_tokens, "Model tokens used", agent=agent, model=model, type="prompt")
+    registry.inc("food_ai_agent_tokens_total", completion_tokens, "Model tokens used", agent=agent, model=model, type="completion")
+    registry.inc("food_ai_agent_cost_usd_total", cost, "Estimated model cost in USD", agent=agent, model=model)
+    return {"model": model, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cost_usd": round(cost, 6)}
+
+
+def record_call(agent: str, seconds: float, queue_seconds: float, retries: int, status: str, response=None,
+                first_token_seconds: float = None, model: str = None, usage=None):
+    """
+    Record one model call made through resilient_call, including usage when the response carries it.
+    Streamed calls pass the time to the first token and the model and usage from their final chunk.
+    """
+    if response is not None:
+        model = getattr(response, "model", model)
+        usage = getattr(response, "usage", None) or usage
+    registry.observe("food_ai_agent_latency_seconds", seconds, "Wall time of model calls", agent=agent)
+    if first_token_seconds is not None:
+        registry.observe("food_ai_agent_first_token_seconds", first_token_seconds, "Time to the first streamed token", agent=agent)
+    registry.observe("food_ai_agent_queue_seconds", queue_seconds, "Time a call waited before starting", agent=agent)
+    registry.inc("food_ai_agent_calls_total", 1, "Model calls by outcome", agent=agent, status=status)
+    registry.inc("food_ai_agent_retries_total", retries, "Retried model call attempts", agent=agent)
+    event = {
+        "event": "model_call",
+        "agent": agent,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "queue_seconds": round(queue_seconds, 3),
+        "retries": retries,
+        "timestamp": time.time(),
+    }
+    if first_token_seconds is not None:
+        event["first_token_seconds"] = round(first_token_seconds, 3)
+    if usage is not None:
+        event.update(record_usage(agent, model, usage))
+    _export(event)
+
+
+def record_image_prep(original_bytes: int, encoded_bytes: int, seconds: float):
+    """Record the size of an upload before and after downscaling, and the time spent preparing it"""
+    registry.observe("food_ai_image_prep_seconds", seconds, "Time to decode, downscale and re-encode an upload")
+    registry.inc("food_ai_image_bytes_total", original_bytes, "Image bytes before and after downscaling", stage="original")
+    registry.inc("food_ai_image_bytes_total", encoded_bytes, "Image bytes before and after downscaling", stage="encoded")
+    _export({
+        "event": "image_prep",
+        "original_bytes": original_bytes,
+        "encoded_bytes": encoded_bytes,
+        "seconds": round(seconds, 3),
+        "timestamp": time.time(),
+    })
+
+
+def _export(event: dict):
+    """Log the event as a JSON line and refresh the textfile, as configured"""
+    if METRICS_JSON_LOGS:
+        print(json.dumps(event))
+    if METRICS_TEXTFILE:
+        try:
+            write_textfile(METRICS_TEXTFILE)
+        except OSError as e:
+            # Metrics must never fail the call they describe
+            print(f"Could not write metrics to {METRICS_TEXTFILE}: {e}")
@@ -0,0 +1,153 @@
+import json
+import os
+
+import numpy as np
+
+DTYPE = np.dtype("<f4")
+MATRIX_NAME = "embeddings.npy"
+SCALES_NAME = "scales.npy"
+METADATA_NAME = "metadata.json"
+# Storage types for the index matrix; int8 rows carry a float32 scale each
+STORAGE_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2"), "int8": np.dtype("i1")}
+# Reduced-precision rows are converted to float32 this many bytes at a time while scoring,
+# so a query never materializes a float32 copy of the whole matrix
+SCORE_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row so cosine similarity becomes a dot product"""
+    matrix = np.asarray(matrix, dtype=DTYPE)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def truncate_rows(matrix, dimensions=None):
+    """
+    Keep the first dimensions components and renormalize.
+    text-embedding-3 models are trained so that truncated prefixes remain good embeddings.
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=DTYPE))
+    if dimensions is not None:
+        matrix = matrix[:, :dimensions]
+    return normalize_rows(matrix)
+
+
+def quantize_rows(matrix, storage="float32"):
+    """
+    Convert a normalized float32 matrix to the storage type.
+    Returns (stored_matrix, scales); scales is None unless storage is int8.
+    """
+    if storage not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown storage type {storage!r}, expected one of {tuple(STORAGE_DTYPES)}")
+    if storage != "int8":
+        return matrix.astype(STORAGE_DTYPES[storage]), None
+    max_abs = np.abs(matrix).max(axis=1)
+    scales = np.where(max_abs == 0, 1, max_abs / 127).astype(DTYPE)
+    stored = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(STORAGE_DTYPES["int8"])
+    return stored, scales
+
+
+class NumpyIndex:
+    """
+    Exact nearest-neighbour search over a row-normalized matrix.
+
+    The SR Legacy corpus is small enough that a brute-force matrix product beats
+    an HNSW graph on latency, and ties are broken by row order so results are deterministic.
+    The matrix may be stored truncated and as float16 or int8; queries are truncated to match.
+    """
+
+    def __init__(self, embeddings, documents, metadatas, scales=None):
+        self.embeddings = embeddings
+        self.documents = documents
+        self.metadatas = metadatas
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def dimensions(self):
+        return self.embeddings.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _scores(self, queries):
+        """Cosine scores of every row for each query, shape (n_queries, n_rows)"""
+        if self.embeddings.dtype == DTYPE:
+            scores = queries @ self.embeddings.T
+        else:
+            scores = np.empty((queries.shape[0], len(self)), dtype=DTYPE)
+            chunk_rows = max(1, SCORE_CHUNK_BYTES // (self.dimensions * DTYPE.itemsize))
+            # One reusable float32 buffer, so only a single converted chunk exists at a time
+            buffer = np.empty((min(chunk_rows, len(self)), self.dimensions), dtype=DTYPE)
+            for start in range(0, len(self), chunk_rows):
+                chunk = buffer[:min(chunk_rows, len(self) - start)]
+                chunk[...] = self.embeddings[start:start + len(chunk)]
+                scores[:, start:start + len(chunk)] = (chunk @ queries.T).T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def top_k(self, embeddings, k=1):
+        """Return (indices, scores) arrays of shape (n_queries, k), best match first"""
+        queries = truncate_rows(embeddings, self.dimensions)
+        if queries.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Query embeddings have {queries.shape[1]} dimensions but the index has {self.dimensions}; "
+                "queries must be at least as wide as the index"
+            )
+        scores = self._scores(queries)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.lexsort((top, -top_scores), axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def similarity_search_by_vector(self, embedding, k=1):
+        """Exact cosine search, returning Documents like the Chroma store does"""
+        return self.batch_similarity_search_by_vector([embedding], k=k)[0]
+
+    def batch_similarity_search_by_vector(self, embeddings, k=1):
+        """Exact cosine search for many queries with one matrix product, one Document list per query"""
+        from langchain_core.documents import Document
+
+        indices, _ = self.top_k(embeddings, k=k)
+        return [
+            [Document(page_content=self.documents[i], metadata=self.metadatas[i]) for i in row]
+            for row in indices
+        ]
+
+
+def build_index(documents, metadatas, embeddings, dimensions=None, storage="float32"):
+    """Build an in-memory index, optionally truncated to dimensions and quantized to storage"""
+    matrix, scales = quantize_rows(truncate_rows(embeddings, dimensions), storage)
+    return NumpyIndex(matrix, list(documents), list(metadatas), scales)
+
+
+def save_numpy_index(output_dir, documents, metadatas, embeddings, dimensions=None, storage="float32"):
+    """Write the normalized matrix as .npy and the descriptions and metadata as a JSON table"""
+    index = build_index(documents, metadatas, embeddings, dimensions, storage)
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, MATRIX_NAME), index.embeddings)
+    scales_path = os.path.join(output_dir, SCALES_NAME)
+    if index.scales is not None:
+        np.save(scales_path, index.scales)
+    elif os.path.exists(scales_path):
+        os.remove(scales_path)
+    with open(os.path.join(output_dir, METADATA_NAME), "w") as f:
+        json.dump({"documents": index.documents, "metadatas": index.metadatas}, f)
+    print(f"NumPy index with {len(index)} vectors of dim {index.dimensions} ({storage}) saved at: {output_dir}")
+
+
+def load_numpy_index(index_dir):
+    """Open an index written by save_numpy_index, memory-mapping the matrix"""
+    embeddings = np.load(os.path.join(index_dir, MATRIX_NAME), mmap_mode="r")
+    scales_path = os.path.join(index_dir, SCALES_NAME)
+    scales = np.load(scales_path) if os.path.exists(scales_path) else None
+    with open(os.path.join(index_dir, METADATA_NAME), "r") as f:
+        table = json.load(f)
+    if embeddings.shape[0] != len(table["documents"]):
+        raise ValueError(f"NumPy index at {index_dir} has mismatched matrix and metadata")
+    return NumpyIndex(embeddings, table["documents"], table["metadatas"], scales)
@@ -0,0 +1,119 @@
+import json
+import os
+
+import numpy as np
+
+RECORDS_NAME = "nutrients.npy"
+DESCRIPTIONS_NAME = "descriptions.json"
+# FoodData Central nutrient ids of the per-100g macros the app displays
+NUTRIENT_IDS = {1008: "energy_kcal", 1003: "protein_g", 1004: "fat_g", 1005: "carbs_g"}
+RECORD_DTYPE = np.dtype([("fdc_id", "<i8")] + [(name, "<f4") for name in NUTRIENT_IDS.values()])
+
+
+def food_record(food_item) -> tuple:
+    """One FoodData Central food as a RECORD_DTYPE row; nutrients the food lacks are NaN"""
+    values = dict.fromkeys(NUTRIENT_IDS.values(), np.nan)
+    for nutrient in food_item.get("foodNutrients", []):
+        name = NUTRIENT_IDS.get(nutrient["nutrient"]["id"])
+        if name is not None and "amount" in nutrient:
+            values[name] = nutrient["amount"]
+    return (food_item["fdcId"],) + tuple(values[name] for name in NUTRIENT_IDS.values())
+
+
+class NutrientStore:
+    """
+    Columnar per-100g macros for every food, sorted by fdcId.
+
+    Single lookups go through a dict from fdcId to row; many ids at once are resolved
+    with one searchsorted over the sorted id column, so no network call is ever needed.
+    """
+
+    def __init__(self, records, descriptions):
+        self.records = records
+        self.descriptions = descriptions
+        self._rows = {int(fdc_id): row for row, fdc_id in enumerate(records["fdc_id"])}
+        self._description_rows = {description.lower(): row for row, description in enumerate(descriptions)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, fdc_id):
+        return int(fdc_id) in self._rows
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    def _row_dict(self, row: int) -> dict:
+        record = self.records[row]
+        result = {"fdc_id": int(record["fdc_id"]), "description": self.descriptions[row]}
+        result.update({name: float(record[name]) for name in NUTRIENT_IDS.values()})
+        return result
+
+    def get(self, fdc_id):
+        """Macros for one fdcId as a dict, or None if it is not in the store"""
+        row = self._rows.get(int(fdc_id))
+        return self._row_dict(row) if row is not None else None
+
+    def get_by_description(self, description: str):
+        """Macros for a food by its exact (case-insensitive) description, e.g. a retrieval match"""
+        row = self._description_rows.get(description.lower())
+        return self._row_dict(row) if row is not None else None
+
+    def rows(self, fdc_ids) -> np.ndarray:
+        """Row number of each fdcId, -1 where the id is unknown"""
+        fdc_ids = np.asarray(fdc_ids, dtype=np.int64)
+        ids = self.records["fdc_id"]
+        if len(ids) == 0:
+            return np.full(fdc_ids.shape, -1, dtype=np.int64)
+        rows = np.searchsorted(ids, fdc_ids)
+        rows = np.minimum(rows, len(ids) - 1)
+        return np.where(ids[rows] == fdc_ids, rows, -1)
+
+    def lookup(self, fdc_ids) -> np.ndarray:
+        """RECORD_DTYPE rows for many fdcIds at once, in order; unknown ids get NaN nutrients"""
+        fdc_ids = np.asarray(fdc_ids, dtype=np.int64)
+        rows = self.rows(fdc_ids)
+        found = rows >= 0
+        result = np.zeros(fdc_ids.shape, dtype=RECORD_DTYPE)
+        result[found] = self.records[rows[found]]
+        for name in NUTRIENT_IDS.values():
+            result[name][~found] = np.nan
+        result["fdc_id"] = fdc_ids
+        return result
+
+
+def build_nutrient_store(foods) -> NutrientStore:
+    """Build an in-memory store from an iterable of FoodData Central food items"""
+    records, descriptions = [], []
+    for food_item in foods:
+        records.append(food_record(food_item))
+        descriptions.append(food_item.get("description", ""))
+    records = np.array(records, dtype=RECORD_DTYPE)
+    order = np.argsort(records["fdc_id"], kind="stable")
+    if len(order) > 1 and np.any(np.diff(records["fdc_id"][order]) == 0):
+        raise ValueError("Duplicate fdcId in the food data")
+    return NutrientStore(records[order], [descriptions[i] for i in order])
+
+
+def save_nutrient_store(output_dir, foods):
+    """Write the records as a structured .npy array and the descriptions as a row-aligned JSON list"""
+    store = build_nutrient_store(foods)
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, RECORDS_NAME), store.records)
+    with open(os.path.join(output_dir, DESCRIPTIONS_NAME), "w") as f:
+        json.dump(store.descriptions, f)
+    print(f"Nutrient store with {len(store)} foods ({store.nbytes / 1024:.0f} KiB) saved at: {output_dir}")
+    return store
+
+
+def load_nutrient_store(store_dir) -> NutrientStore:
+    """Open a store written by save_nutrient_store, memory-mapping the records"""
+    records = np.load(os.path.join(store_dir, RECORDS_NAME), mmap_mode="r")
+    if records.dtype != RECORD_DTYPE:
+        raise ValueError(f"Nutrient store at {store_dir} has dtype {records.dtype}, expected {RECORD_DTYPE}")
+    with open(os.path.join(store_dir, DESCRIPTIONS_NAME), "r") as f:
+        descriptions = json.load(f)
+    if len(records) != len(descriptions):
+        raise ValueError(f"Nutrient store at {store_dir} has mismatched records and descriptions")
+    return NutrientStore(records, descriptions)
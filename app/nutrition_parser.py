@@ -0,0 +1,146 @@
+import re
+import threading
+
+NUTRIENTS = ("energy", "protein", "fat", "carbs")
+NUTRIENT_PATTERNS = [
+    ("energy", re.compile(r"energy|calorie|kcal", re.I)),
+    ("protein", re.compile(r"protein", re.I)),
+    ("carbs", re.compile(r"carb", re.I)),
+    ("fat", re.compile(r"\bfats?\b", re.I)),
+]
+
+NUMBER = r"\d[\d,]*(?:\.\d+)?"
+RANGE_RE = re.compile(rf"({NUMBER})\s*(?:kcal|cal|g)?\s*(?:-|–|—|to)\s*({NUMBER})", re.I)
+PLUS_MINUS_RE = re.compile(rf"({NUMBER})\s*(?:kcal|cal|g)?\s*(?:±|\+/-|\+-)\s*({NUMBER})\s*(%)?", re.I)
+SINGLE_RE = re.compile(rf"({NUMBER})")
+# Sub-component rows that must not be read as the nutrient itself, e.g. "Saturated Fat" or "Calories from fat"
+SUBTYPE_RE = re.compile(r"saturated|unsaturated|trans\b|mono|poly|from fat|fiber|sugar", re.I)
+TOTAL_RE = re.compile(r"\btotal\b", re.I)
+SUMMARY_RE = re.compile(r"^\s*(?:#+\s*)?\**\s*summary\b", re.I | re.M)
+
+_lock = threading.Lock()
+parse_stats = {"local": 0, "fallback": 0}
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def parse_value(text: str):
+    """
+    Parse a nutrient cell into (min, max).
+    Handles "493 - 611 kcal", "1,200–1,400", "32g to 39g", "550 kcal ± 10%", "30 ± 3 g" and a single "42 g".
+    """
+    match = RANGE_RE.search(text)
+    if match:
+        return _to_float(match.group(1)), _to_float(match.group(2))
+    match = PLUS_MINUS_RE.search(text)
+    if match:
+        value, spread = _to_float(match.group(1)), _to_float(match.group(2))
+        if match.group(3):
+            spread = value * spread / 100
+        return round(value - spread, 2), round(value + spread, 2)
+    match = SINGLE_RE.search(text)
+    if match:
+        value = _to_float(match.group(1))
+        return value, value
+    return None
+
+
+def _nutrient_name(label: str):
+    if SUBTYPE_RE.search(label):
+        return None
+    for name, pattern in NUTRIENT_PATTERNS:
+        if pattern.search(label):
+            return name
+    return None
+
+
+def _split_row(line: str):
+    """Split a markdown pipe row or a tab/colon separated line into (label, value cells)"""
+    line = line.strip()
+    if "|" in line:
+        cells = [cell.strip() for cell in line.strip("|").split("|")]
+    elif "\t" in line:
+        cells = [cell.strip() for cell in line.split("\t")]
+    elif ":" in line:
+        cells = [cell.strip() for cell in line.split(":", 1)]
+    else:
+        return None
+    cells = [cell for cell in cells if cell]
+    if len(cells) < 2:
+        return None
+    return cells[0], cells[1:]
+
+
+def parse_cells(cells: list):
+    """
+    Parse the value cells of a row into (min, max).
+    A cell holding a range wins; otherwise two numeric cells (e.g. "| Min | Max |" columns) are min and max.
+    """
+    values = [parse_value(cell) for cell in cells]
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    for low, high in values:
+        if low != high:
+            return low, high
+    if len(values) >= 2 and values[0][0] <= values[1][0]:
+        return values[0][0], values[1][0]
+    return values[0]
+
+
+def validate(nutrition_list) -> bool:
+    """All four nutrients present exactly once, with non-negative min <= max"""
+    if not isinstance(nutrition_list, list) or len(nutrition_list) != len(NUTRIENTS):
+        return False
+    if sorted(item.get("nutrient") for item in nutrition_list) != sorted(NUTRIENTS):
+        return False
+    return all(0 <= item["min"] <= item["max"] for item in nutrition_list)
+
+
+def parse_summary_table(agent2_response: str):
+    """
+    Parse the Summary table of agent2's markdown into the agent3 format:
+    [{"nutrient": "energy", "min": 493.0, "max": 611.0}, ...].
+    Returns None if there is no Summary heading or the table fails validation; the
+    per-ingredient lines above the Summary must never be taken for the meal totals.
+    """
+    matches = list(SUMMARY_RE.finditer(agent2_response))
+    if not matches:
+        return None
+    section = agent2_response[matches[-1].end():]
+
+    found = {}
+    for line in section.splitlines():
+        row = _split_row(line)
+        if row is None:
+            continue
+        label, cells = row
+        # Strip markdown emphasis and units in the label, e.g. "**Energy (kcal)**"
+        label = label.replace("*", "")
+        name = _nutrient_name(label)
+        # The first row per nutrient wins, unless a later one is explicitly the total
+        if name is None or (name in found and not TOTAL_RE.search(label)):
+            continue
+        value = parse_cells([cell.replace("*", "") for cell in cells])
+        if value is not None:
+            found[name] = value
+
+    nutrition_list = [
+        {"nutrient": name, "min": float(found[name][0]), "max": float(found[name][1])}
+        for name in NUTRIENTS if name in found
+    ]
+    return nutrition_list if validate(nutrition_list) else None
+
+
+def record_parse(path: str):
+    """Count which path produced the parsed nutrition: "local" or "fallback" (agent3)"""
+    with _lock:
+        parse_stats[path] += 1
+
+
+def fallback_rate() -> float:
+    with _lock:
+        total = parse_stats["local"] + parse_stats["fallback"]
+        return parse_stats["fallback"] / total if total else 0.0
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+# Connection pool and timeout settings shared by every agent call in the process
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+# "openai" uses the OpenAI API (or OPENAI_BASE_URL if set); "local" uses an OpenAI-compatible
+# server at LOCAL_MODEL_URL, such as fake_openai_server.py, and needs no API key
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "openai")
+MODEL_BACKENDS = ("openai", "local")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+LOCAL_MODEL_URL = os.getenv("LOCAL_MODEL_URL", "http://127.0.0.1:8089/v1")
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _api_key():
+    """The key from streamlit secrets, or OPENAI_API_KEY when running outside the app"""
+    if MODEL_BACKEND == "local":
+        return os.getenv("OPENAI_API_KEY", "local")
+    import streamlit as st
+
+    try:
+        return st.secrets["general"]["OPENAI_API_KEY"]
+    except (FileNotFoundError, KeyError):
+        return os.getenv("OPENAI_API_KEY")
+
+
+def base_url():
+    """API base URL for the configured MODEL_BACKEND; None means the OpenAI default"""
+    if MODEL_BACKEND not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend {MODEL_BACKEND!r}, expected one of {MODEL_BACKENDS}")
+    return LOCAL_MODEL_URL if MODEL_BACKEND == "local" else OPENAI_BASE_URL
+
+
+def embeddings_kwargs() -> dict:
+    """
+    Keyword arguments pointing langchain's OpenAIEmbeddings at the configured backend.
+    The local backend skips tiktoken length checks, which would download encodings.
+    """
+    kwargs = {"api_key": _api_key(), "base_url": base_url()}
+    if MODEL_BACKEND == "local":
+        kwargs["check_embedding_ctx_length"] = False
+    return kwargs
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def get_client() -> "OpenAI":
+    """
+    Return the process-wide OpenAI client.
+    It owns one keep-alive httpx pool, so consecutive agent calls reuse warm TLS connections.
+    The openai package is imported here rather than at module load, since it dominates startup time.
+    """
+    import httpx
+    from openai import OpenAI
+
+    global _client
+    with _lock:
+        if _client is None:
+            _client = OpenAI(
+                api_key=_api_key(),
+                base_url=base_url(),
+                timeout=_timeout(),
+                # Retries are handled by resilience.resilient_call within the agent's deadline
+                max_retries=0,
+                http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+            )
+        return _client
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Async twin of get_client for concurrent use.
+    httpx async pools are bound to the event loop that created them, so there is one client per loop.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=_api_key(),
+                base_url=base_url(),
+                timeout=_timeout(),
+                # Retries are handled by resilience.resilient_call within the agent's deadline
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+            )
+            _async_clients[loop] = client
+        return client
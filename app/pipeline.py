@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline step fails or times out; carries the partial results"""
+
+    def __init__(self, message, errors, results):
+        super().__init__(message)
+        self.errors = errors
+        self.results = results
+
+
+class AgentPipeline:
+    """
+    Dependency graph of agent calls.
+
+    Each step is a plain (blocking) function. Steps whose dependencies are done run
+    concurrently in worker threads, each under its own timeout. The results of a
+    step's dependencies are passed after its own args, in depends_on order.
+
+    Example:
+        pipeline = AgentPipeline()
+        pipeline.add("parse", agent3_parse_nutrition, args=(markdown,), timeout=30)
+        pipeline.add("summary", agent4_create_summary, args=(markdown,), timeout=30)
+        results = pipeline.run()
+    """
+
+    def __init__(self, max_workers=8):
+        self.steps = {}
+        self.timings = {}
+        self.max_workers = max_workers
+
+    def add(self, name, fn, args=(), depends_on=(), timeout=None):
+        if name in self.steps:
+            raise ValueError(f"Duplicate pipeline step: {name}")
+        for dependency in depends_on:
+            if dependency not in self.steps:
+                raise ValueError(f"Step {name} depends on unknown step {dependency}")
+        self.steps[name] = {"fn": fn, "args": tuple(args), "depends_on": tuple(depends_on), "timeout": timeout}
+        return self
+
+    async def _run_step(self, name, step, tasks, executor):
+        dependency_results = [await tasks[dependency] for dependency in step["depends_on"]]
+        start = time.perf_counter()
+        # Carry context variables (such as the active latency budget) into the worker thread,
+        # plus the time the step became ready so model calls can report their queue time
+        context = contextvars.copy_context()
+        context.run(metrics.call_ready_at.set, time.monotonic())
+        call = functools.partial(context.run, step["fn"], *step["args"], *dependency_results)
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(executor, call),
+                timeout=step["timeout"]
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Step {name} timed out after {step['timeout']}s")
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    async def run_async(self):
+        """Run every step, returning a dict of step name -> result"""
+        tasks = {}
+        # A private pool that is not waited on, so a timed-out call cannot hold up the caller
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-pipeline")
+        try:
+            # Steps can only depend on earlier steps, so insertion order is a valid topological order
+            for name, step in self.steps.items():
+                tasks[name] = asyncio.ensure_future(self._run_step(name, step, tasks, executor))
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            executor.shutdown(wait=False)
+
+        results, errors = {}, {}
+        for name, task in tasks.items():
+            if task.exception() is not None:
+                errors[name] = task.exception()
+            else:
+                results[name] = task.result()
+        if errors:
+            details = "; ".join(f"{name}: {error}" for name, error in errors.items())
+            raise PipelineError(f"Pipeline failed: {details}", errors, results)
+        return results
+
+    def run(self):
+        """Blocking entry point for the Streamlit script thread"""
+        return asyncio.run(self.run_async())
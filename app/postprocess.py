@@ -16,8 +16,6 @@ def load_results_from_file():
         results = json.load(f)
     return results
 
-all_nutrition = load_results_from_file()
-
 def filter_nutrition_data(all_nutrition):
     nutrient_filter = [1005, 1003, 1008, 1004]
     # all_nutrition = load_results_from_file()
@@ -3,25 +3,27 @@ import sys
 import pysqlite3
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 import json
-import pandas as pd
 import base64
 from pathlib import Path
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 import os
 from dotenv import load_dotenv
-from langchain_core.documents import Document
 from uuid import uuid4
-import streamlit as st
-import boto3
-import streamlit as st
-from PIL import Image
 import io
+import time
 from datetime import datetime
 import uuid
+from metrics import record_image_prep
+from openai_client import embeddings_kwargs
 
+# Heavy dependencies (pandas, langchain, boto3, PIL, ijson) are imported inside the functions
+# that use them, and secrets are read on use, so importing this module is cheap and does no I/O
 load_dotenv()
-openai_api_key = st.secrets["general"]["OPENAI_API_KEY"]
+
+# Images sent to the vision agents are downscaled so the longest edge is at most IMAGE_MAX_EDGE pixels
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
 
 def encode_image(file) -> str:
     """
@@ -33,6 +35,39 @@ def encode_image(file) -> str:
     except Exception as e:
         raise ValueError(f"Error encoding image: {str(e)}")
 
+def prepare_image(file, max_edge: int = IMAGE_MAX_EDGE, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> tuple:
+    """
+    Takes a file-like object and returns (base64 image, MIME type, stats) ready for the vision agents.
+    The image is rotated according to its EXIF orientation, downscaled to max_edge and re-encoded
+    as JPEG or WEBP at the given quality. stats reports the bytes before and after and the time taken.
+    """
+    from PIL import Image, ImageOps
+
+    image_format = image_format.upper()
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    start = time.perf_counter()
+    try:
+        file.seek(0)
+        raw = file.read()
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+        encoded = buffer.getvalue()
+    except Exception as e:
+        raise ValueError(f"Error preparing image: {str(e)}")
+    stats = {
+        "original_bytes": len(raw),
+        "encoded_bytes": len(encoded),
+        "size": image.size,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    record_image_prep(stats["original_bytes"], stats["encoded_bytes"], stats["seconds"])
+    return base64.b64encode(encoded).decode('utf-8'), IMAGE_MIME_TYPES[image_format], stats
+
 def encode_image_path(image_path: str) -> str:
     """
     Take the path of image file and return the base64 encoded image.
@@ -47,6 +82,8 @@ def encode_image_path(image_path: str) -> str:
     
 
 def upload_image(file):
+    import boto3
+    import streamlit as st
 
     bucket_name = "food-ai-images"
 
@@ -70,28 +107,64 @@ def upload_image(file):
         ContentType=file.type if file.type else 'application/octet-stream'
     )
     
-def filter_food_description_from_USDA_DB(database_url: str):
+def iter_fdc_foods(input_file, dataset: str = "SRLegacyFoods"):
+    """
+    Yield the food items of one dataset ("SRLegacyFoods", "FoundationFoods", "BrandedFoods", ...)
+    from a FoodData Central JSON export one at a time, without loading the whole file.
+    """
+    import ijson
+
+    with open(input_file, 'rb') as file:
+        yield from ijson.items(file, f"{dataset}.item", use_float=True)
+
+def read_food_records(path: str):
+    """
+    Yield the records of a processed food file: JSON Lines (one object per line) as written by
+    process_food_db, or a JSON list as written by earlier versions.
+    """
+    with open(path, 'r') as file:
+        if path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(file)
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where the platform cannot report it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def filter_food_description_from_USDA_DB(database_url: str, dataset: str = "SRLegacyFoods"):
     """
     Take the USDA database URL and filter the food description from the database.
     """
-    with open(database_url, 'r') as file:
-        data = json.load(file)
-    
-    food_descriptions = [item['description'] for item in data['SRLegacyFoods']]
-    food_descriptions_df = pd.DataFrame(food_descriptions, columns=['Description'])
+    import pandas as pd
+
     output_path = "../data/food_db/food_descriptions.csv"
-    if not Path(output_path).is_file():
-        food_descriptions_df.to_csv(output_path, index=False, quoting=1)
-        print(f"Processed food descriptions saved to {output_path}")
-    else:
-        'File already exists'
+    if Path(output_path).is_file():
+        print(f"{output_path} already exists")
+        return
+    food_descriptions = [item['description'] for item in iter_fdc_foods(database_url, dataset)]
+    food_descriptions_df = pd.DataFrame(food_descriptions, columns=['Description'])
+    food_descriptions_df.to_csv(output_path, index=False, quoting=1)
+    print(f"Processed food descriptions saved to {output_path}")
 
 def vector_db(filtered_db_path: str, vector_db_path: str):
     """
     Take the filtered database and vectorize the food descriptions.
     Each line in the file will be one vector.
     """
-    openai_embeddings = OpenAIEmbeddings(model="text-embedding-ada-002", api_key=openai_api_key)
+    import pandas as pd
+    from langchain_chroma import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+    openai_embeddings = OpenAIEmbeddings(model="text-embedding-ada-002", **embeddings_kwargs())
     if not Path(vector_db_path).is_dir():
         data = pd.read_csv(filtered_db_path)
         text_data = data['Description'].tolist()
@@ -100,20 +173,24 @@ def vector_db(filtered_db_path: str, vector_db_path: str):
         db = Chroma(persist_directory=vector_db_path, embedding_function=openai_embeddings)
     return db
 
-def vector_db_json(filtered_db_path: str, vector_db_path: str):
+def vector_db_json(filtered_db_path: str, vector_db_path: str, dimensions: int = None):
     """
     Vectorize a JSON file with descriptions and metadata, storing them in a Chroma vector database.
 
     Args:
-        filtered_db_path (str): Path to the input JSON file.
+        filtered_db_path (str): Path to the processed food file (.jsonl or .json).
         vector_db_path (str): Directory path where the vector database will be stored.
+        dimensions (int): Optional reduced embedding size (e.g. 256, 512 or 1024). Queries must use the same value.
     """
-    # Load JSON data
-    with open(filtered_db_path, 'r') as file:
-        json_data = json.load(file)
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+    from langchain_openai import OpenAIEmbeddings
+
+    # Load the processed food records (JSON Lines or a JSON list)
+    json_data = read_food_records(filtered_db_path)
 
     # Initialize embeddings and vector store
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", dimensions=dimensions, **embeddings_kwargs())
     vector_store = Chroma(
         collection_name="food_items_collection",
         embedding_function=embeddings,
@@ -142,6 +219,57 @@ def vector_db_json(filtered_db_path: str, vector_db_path: str):
 
 
     print(f"Vector database created and saved at: {vector_db_path}")
+
+def load_vector_db_json(vector_db_path: str) -> dict:
+    """
+    Read the descriptions, metadata and embeddings back out of the Chroma collection built by vector_db_json.
+    """
+    from langchain_chroma import Chroma
+
+    vector_store = Chroma(
+        collection_name="food_items_collection",
+        persist_directory=vector_db_path
+    )
+    return vector_store.get(include=["documents", "metadatas", "embeddings"])
+
+def build_snapshot(vector_db_path: str, snapshot_path: str, dimensions: int = None, storage: str = "float32"):
+    """
+    Pack the Chroma collection built by vector_db_json into a single memory-mappable snapshot file.
+
+    Args:
+        vector_db_path (str): Directory of the Chroma vector database.
+        snapshot_path (str): Path of the snapshot file to write.
+        dimensions (int): Optional number of leading embedding dimensions to keep.
+        storage (str): Matrix storage type, one of "float32", "float16" or "int8".
+    """
+    from snapshot import write_snapshot
+
+    data = load_vector_db_json(vector_db_path)
+    write_snapshot(
+        snapshot_path,
+        documents=data["documents"],
+        metadatas=data["metadatas"],
+        embeddings=data["embeddings"],
+        model="text-embedding-3-large",
+        dimensions=dimensions,
+        storage=storage
+    )
+
+def build_numpy_index(vector_db_path: str, index_dir: str, dimensions: int = None, storage: str = "float32"):
+    """
+    Export the Chroma collection built by vector_db_json as a NumPy index (.npy matrix plus metadata table).
+
+    Args:
+        vector_db_path (str): Directory of the Chroma vector database.
+        index_dir (str): Directory where the NumPy index will be written.
+        dimensions (int): Optional number of leading embedding dimensions to keep.
+        storage (str): Matrix storage type, one of "float32", "float16" or "int8".
+    """
+    from numpy_index import save_numpy_index
+
+    data = load_vector_db_json(vector_db_path)
+    save_numpy_index(index_dir, data["documents"], data["metadatas"], data["embeddings"], dimensions, storage)
+
 def filter_nutrition_data(food_data):
     """
     Filters the food data to only include the desired nutrient information.
@@ -162,34 +290,60 @@ def filter_nutrition_data(food_data):
     
     return result
 
-def process_food_db(input_file, output_file):
+def process_food_db(input_file, output_file, dataset: str = "SRLegacyFoods"):
     """
-    Processes the entire food database, filters relevant nutrient information,
-    and saves it to a new file.
+    Stream the food database, filter the relevant nutrient information item by item and write
+    it as compact JSON Lines, so memory stays flat however large the export is.
+    Returns the foods processed, throughput and peak memory.
     """
-    # Load the input JSON file
-    with open(input_file, 'r') as file:
-        food_db = json.load(file)
+    start = time.perf_counter()
+    count = 0
+    with open(output_file, 'w') as file:
+        for food_item in iter_fdc_foods(input_file, dataset):
+            file.write(json.dumps(filter_nutrition_data(food_item), separators=(",", ":")) + "\n")
+            count += 1
 
-    # Process each food item
-    processed_data = []
-    for food_item in food_db["SRLegacyFoods"]:
-        filtered_data = filter_nutrition_data(food_item)
-        processed_data.append(filtered_data)
+    seconds = time.perf_counter() - start
+    input_mb = os.path.getsize(input_file) / (1024 * 1024)
+    stats = {
+        "foods": count,
+        "seconds": round(seconds, 2),
+        "foods_per_second": round(count / seconds, 1) if seconds else None,
+        "input_mb_per_second": round(input_mb / seconds, 1) if seconds else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(f"Processed {count} {dataset} foods from {input_mb:.1f} MB into {output_file}: {stats}")
+    return stats
 
-    # Save the processed data to the output JSON file
-    with open(output_file, 'w') as file:
-        json.dump(processed_data, file, indent=4)
+def build_nutrient_store_from_export(input_file, output_dir):
+    """
+    Convert the SR Legacy export into the offline columnar nutrient store keyed by fdcId
+    (see nutrient_store.py), so per-100g macros can be looked up without the USDA API.
+    """
+    from nutrient_store import save_nutrient_store
+
+    return save_nutrient_store(output_dir, iter_fdc_foods(input_file))
 
 # # File paths
 # input_file = "../../backend/data/food_db/fooddb.json"  # Replace with your input file path
-# output_file = "./filtered_fooddb.json"  # Replace with your desired output file path
+# output_file = "./filtered_fooddb.jsonl"  # Replace with your desired output file path
 
 # # Process the data
 # process_food_db(input_file, output_file)
 
 # Vectorize json file
-# filtered_db_path = "../data/food_db/filtered_fooddb.json"
+# filtered_db_path = "../data/food_db/filtered_fooddb.jsonl"
 # vector_db_path = "../data/food_db/vector_db_json"
 # db = vector_db_json(filtered_db_path, vector_db_path)
 
+# Pack the vector database into a single snapshot file
+# build_snapshot(vector_db_path, "../data/food_db/food_db.snap")
+
+# Export the vector database for the NumPy retrieval backend
+# build_numpy_index(vector_db_path, "../data/food_db/numpy_index")
+
+# Smaller index: 512 dimensions stored as int8 (see recall_report.py for the recall trade-off)
+# build_numpy_index(vector_db_path, "../data/food_db/numpy_index", dimensions=512, storage="int8")
+
+# Offline per-100g nutrient store keyed by fdcId
+# build_nutrient_store_from_export("../data/food_db/fooddb.json", "../data/food_db/nutrient_store")
@@ -0,0 +1,60 @@
+import argparse
+import csv
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from embedding_cache import CachedEmbeddings
+from numpy_index import build_index
+from openai_client import embeddings_kwargs
+
+DIMENSIONS = [None, 1024, 512, 256]
+STORAGES = ["float32", "float16", "int8"]
+
+
+def load_labels(path):
+    """Read a CSV with "ingredient" and "description" columns, the expected USDA match per ingredient"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["ingredient"], row["description"]) for row in csv.DictReader(f)]
+
+
+def recall_at(index, query_vectors, expected, k):
+    indices, _ = index.top_k(query_vectors, k=k)
+    hits = sum(target in {index.documents[i] for i in row} for row, target in zip(indices, expected))
+    return hits / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report retrieval recall against index size for reduced and quantized indexes.")
+    parser.add_argument("labels", help="CSV of ingredient,description pairs")
+    parser.add_argument("--chroma-dir", default="../data/food_db_cloud/vector_db_json")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    data = Chroma(collection_name="food_items_collection", persist_directory=args.chroma_dir).get(
+        include=["documents", "metadatas", "embeddings"]
+    )
+    known = set(data["documents"])
+    missing = [description for _, description in labels if description not in known]
+    if missing:
+        print(f"Warning: {len(missing)} labelled descriptions are not in the collection, e.g. {missing[0]!r}")
+
+    # Full-size query embeddings; each index truncates them to its own size
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large", **embeddings_kwargs()), model="text-embedding-3-large")
+    query_vectors = np.asarray(embeddings.embed_documents([ingredient for ingredient, _ in labels]), dtype=np.float32)
+    expected = [description for _, description in labels]
+
+    print(f"{len(labels)} labelled ingredients, {len(data['documents'])} indexed descriptions")
+    print(f"{'dims':>6} {'storage':>8} {'size MB':>9} {'recall@1':>9} {'recall@5':>9}")
+    for dimensions in DIMENSIONS:
+        for storage in STORAGES:
+            index = build_index(data["documents"], data["metadatas"], data["embeddings"], dimensions, storage)
+            print(
+                f"{index.dimensions:>6} {storage:>8} {index.nbytes / (1024 * 1024):>9.1f} "
+                f"{recall_at(index, query_vectors, expected, 1):>9.3f} {recall_at(index, query_vectors, expected, 5):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import contextlib
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+# Retry and deadline settings for model calls
+AGENT_DEADLINE = float(os.getenv("AGENT_DEADLINE", "45"))
+MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("AGENT_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("AGENT_BACKOFF_MAX", "8"))
+# Hedging sends a duplicate request once a call is slower than the agent's recent p95
+HEDGE_ENABLED = os.getenv("AGENT_HEDGE", "0") == "1"
+HEDGE_MIN_SAMPLES = 20
+# Total latency budget for all model calls of one upload
+UPLOAD_BUDGET = float(os.getenv("UPLOAD_LATENCY_BUDGET", "90"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call cannot finish within its deadline or the upload's latency budget"""
+
+
+class LatencyBudget:
+    """Wall-clock budget shared by every model call made for one upload"""
+
+    def __init__(self, seconds: float = UPLOAD_BUDGET):
+        self.seconds = seconds
+        self.start = time.monotonic()
+
+    def remaining(self) -> float:
+        return self.seconds - (time.monotonic() - self.start)
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_budget = contextvars.ContextVar("latency_budget", default=None)
+
+
+@contextlib.contextmanager
+def latency_budget(budget: LatencyBudget):
+    """Make budget apply to every resilient_call in this context"""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per agent, used to pick the hedging delay"""
+
+    def __init__(self, window: int = 200):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    def p95(self, name: str):
+        with self._lock:
+            samples = sorted(self._samples[name])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+latency_tracker = LatencyTracker()
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="agent-hedge")
+
+
+def is_retryable(error: Exception) -> bool:
+    # Only reached once a call has failed, by which point the client has imported openai
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header when the server sends one"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _hedged(name, fn, timeout, hedge):
+    """Run fn(timeout), sending a duplicate after the agent's p95 latency if hedge is set; the first answer wins"""
+    delay = latency_tracker.p95(name) if hedge else None
+    if delay is None or delay >= timeout:
+        return fn(timeout)
+    start = time.monotonic()
+    futures = {_hedge_pool.submit(contextvars.copy_context().run, fn, timeout)}
+    done, _ = wait(futures, timeout=delay)
+    if not done:
+        futures.add(_hedge_pool.submit(contextvars.copy_context().run, fn, max(timeout - (time.monotonic() - start), 0.1)))
+    errors = []
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # The losing request keeps running in the background; its result is ignored
+                return future.result()
+            errors.append(future.exception())
+    raise errors[0]
+
+
+def _timed_stream(name, stream, call_start, queue_seconds, retries, end):
+    """
+    Yield the chunks of a streamed response, recording the call once the stream ends.
+    Generation is bounded by the same deadline as the request: past end the stream is closed
+    and DeadlineExceeded is raised.
+    """
+    first_token_seconds = None
+    model = usage = None
+    status = "error"
+    try:
+        for chunk in stream:
+            if time.monotonic() > end:
+                status = "deadline"
+                if hasattr(stream, "close"):
+                    stream.close()
+                raise DeadlineExceeded(f"{name} exceeded its latency budget while streaming")
+            if first_token_seconds is None and chunk.choices and chunk.choices[0].delta.content:
+                first_token_seconds = time.monotonic() - call_start
+            model = getattr(chunk, "model", None) or model
+            # The final chunk carries the usage for the whole stream when include_usage is set
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        status = "ok"
+    except GeneratorExit:
+        # The consumer stopped reading before the stream ended
+        status = "cancelled"
+        raise
+    finally:
+        metrics.record_call(name, time.monotonic() - call_start, queue_seconds, retries, status,
+                            first_token_seconds=first_token_seconds, model=model, usage=usage)
+
+
+def resilient_call(name: str, fn, deadline: float = AGENT_DEADLINE, max_retries: int = MAX_RETRIES, hedge: bool = HEDGE_ENABLED,
+                   stream: bool = False):
+    """
+    Call fn(timeout) with a per-agent deadline, retries with jittered exponential backoff on
+    retryable errors, and optional hedging. fn receives the seconds it may still spend and should
+    pass them on as the request timeout. The active LatencyBudget, if any, caps the deadline.
+    With stream=True the response is wrapped so metrics cover the whole stream, including the
+    time to the first token. Streaming calls are never hedged, since the losing stream would keep generating.
+    """
+    hedge = hedge and not stream
+    call_start = time.monotonic()
+    ready_at = metrics.call_ready_at.get()
+    queue_seconds = call_start - ready_at if ready_at is not None else 0.0
+    budget = _current_budget.get()
+    end = call_start + deadline
+    if budget is not None:
+        end = min(end, call_start + budget.remaining())
+
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            metrics.record_call(name, time.monotonic() - call_start, queue_seconds, attempt, "deadline")
+            raise DeadlineExceeded(f"{name} exceeded its latency budget")
+        start = time.monotonic()
+        try:
+            result = _hedged(name, fn, remaining, hedge)
+        except Exception as e:
+            if not is_retryable(e) or attempt >= max_retries:
+                metrics.record_call(name, time.monotonic() - call_start, queue_seconds, attempt, "error")
+                raise
+            delay = backoff_delay(attempt, e)
+            if time.monotonic() + delay >= end:
+                metrics.record_call(name, time.monotonic() - call_start, queue_seconds, attempt, "deadline")
+                raise DeadlineExceeded(f"{name} exceeded its latency budget after {attempt + 1} attempts: {e}")
+            print(f"{name} attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        # Recorded outside the try, so a metrics problem never turns a good response into a retry or an error
+        latency_tracker.record(name, time.monotonic() - start)
+        if stream:
+            return _timed_stream(name, result, call_start, queue_seconds, attempt, end)
+        metrics.record_call(name, time.monotonic() - call_start, queue_seconds, attempt, "ok", result)
+        return result
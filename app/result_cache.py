@@ -0,0 +1,178 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "../data/cache/results.sqlite")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+# Maximum Hamming distance between dHashes for two images to count as near-duplicates.
+# Near-duplicate lookup is opt-in: 0 (the default) only reuses results for byte-identical images
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "0"))
+# Hashes are indexed as 8 bands of 8 bits; two hashes within 7 bits share at least one band exactly
+HASH_BANDS = 8
+# Hashes with fewer set (or unset) bits than this come from flat, low-detail images such as
+# solid colours, which would all look like near-duplicates of each other
+MIN_HASH_DETAIL = 8
+# Expired rows are deleted at most this often; lookups skip them in between
+EXPIRE_INTERVAL = 3600
+
+
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    64-bit difference hash: compares neighbouring pixels of a small grayscale thumbnail,
+    so it survives re-compression, resizing and small colour changes.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def is_low_detail(value: int) -> bool:
+    ones = bin(value).count("1")
+    return ones < MIN_HASH_DETAIL or ones > 64 - MIN_HASH_DETAIL
+
+
+def hash_bands(value: int) -> list:
+    """(band, 8-bit value) pairs used to find near-duplicate candidates without scanning every row"""
+    return [(band, (value >> (8 * band)) & 0xFF) for band in range(HASH_BANDS)]
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class ResultCache:
+    """
+    Persistent cache of vision agent results keyed by the SHA-256 of the image bytes.
+
+    Exact re-uploads are found by content hash, whatever the file name; re-compressed or
+    resized copies can be found through an opt-in dHash near-duplicate lookup, which ignores
+    low-detail images and only compares rows sharing a hash band. Images are only hashed while
+    that lookup is enabled, so rows stored without it are never near-duplicate candidates.
+    Entries expire after ttl seconds.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, ttl: float = RESULT_CACHE_TTL, max_distance: int = PHASH_MAX_DISTANCE):
+        if max_distance >= HASH_BANDS:
+            raise ValueError(f"max_distance must be below {HASH_BANDS} for the banded hash index")
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._last_expire = 0.0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "sha256 TEXT PRIMARY KEY, dhash INTEGER NOT NULL, ingredients TEXT NOT NULL, "
+            "nutrition_augmentation TEXT, created REAL NOT NULL)"
+        )
+        # Caches created before the save-time totals were stored lack these columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        for column in ("totals", "summary"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE results ADD COLUMN {column} TEXT")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hash_bands (sha256 TEXT NOT NULL, band INTEGER NOT NULL, value INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS hash_bands_lookup ON hash_bands (band, value)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS hash_bands_sha256 ON hash_bands (sha256)")
+        self._conn.commit()
+
+    def _expire(self):
+        now = time.time()
+        if now - self._last_expire < EXPIRE_INTERVAL:
+            return
+        self._last_expire = now
+        self._conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        self._conn.execute("DELETE FROM hash_bands WHERE sha256 NOT IN (SELECT sha256 FROM results)")
+        self._conn.commit()
+
+    def _row_to_result(self, row):
+        return {
+            "ingredients": json.loads(row[0]),
+            "nutrition_augmentation": row[1],
+            "totals": json.loads(row[2]) if row[2] is not None else None,
+            "summary": row[3],
+        }
+
+    def get(self, image_bytes: bytes):
+        """
+        Return {"ingredients", "nutrition_augmentation", "totals", "summary"} for this image or a
+        near-duplicate, or None. The last three are None until they have been stored.
+        """
+        digest = content_hash(image_bytes)
+        oldest = time.time() - self.ttl
+        with self._lock:
+            self._expire()
+            row = self._conn.execute(
+                "SELECT ingredients, nutrition_augmentation, totals, summary FROM results WHERE sha256 = ? AND created >= ?",
+                (digest, oldest)
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                return self._row_to_result(row)
+            if self.max_distance > 0:
+                target = dhash(image_bytes)
+                if is_low_detail(target):
+                    self.misses += 1
+                    return None
+                condition = " OR ".join("(b.band = ? AND b.value = ?)" for _ in range(HASH_BANDS))
+                params = [item for pair in hash_bands(target) for item in pair] + [oldest]
+                best = None
+                for *result, stored in self._conn.execute(
+                    "SELECT DISTINCT r.ingredients, r.nutrition_augmentation, r.totals, r.summary, r.dhash FROM hash_bands b "
+                    f"JOIN results r ON r.sha256 = b.sha256 WHERE ({condition}) AND r.created >= ?", params
+                ):
+                    distance = bin(target ^ (stored & ((1 << 64) - 1))).count("1")
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, result)
+                if best is not None:
+                    self.near_hits += 1
+                    return self._row_to_result(best[1])
+            self.misses += 1
+            return None
+
+    def put(self, image_bytes: bytes, ingredients: list, nutrition_augmentation: str = None,
+            totals: list = None, summary: str = None):
+        """Store or update the results for this exact image, including the save-time totals and summary once known"""
+        digest = content_hash(image_bytes)
+        # Decoding the full-size upload for the dHash is only worth it when near-duplicates are looked up;
+        # 0 is a low-detail hash, so the row gets no hash bands
+        value = dhash(image_bytes) if self.max_distance > 0 else 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (sha256, dhash, ingredients, nutrition_augmentation, totals, summary, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, _to_signed(value), json.dumps(ingredients), nutrition_augmentation,
+                 json.dumps(totals) if totals is not None else None, summary, time.time())
+            )
+            self._conn.execute("DELETE FROM hash_bands WHERE sha256 = ?", (digest,))
+            if not is_low_detail(value):
+                self._conn.executemany(
+                    "INSERT INTO hash_bands (sha256, band, value) VALUES (?, ?, ?)",
+                    [(digest, band, band_value) for band, band_value in hash_bands(value)]
+                )
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses}
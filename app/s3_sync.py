@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MANIFEST_NAME = ".s3_manifest.json"
+
+MAX_WORKERS = 8
+# Objects above the threshold are fetched as parallel ranged GETs of CHUNK_SIZE bytes
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024
+# Ranged GETs in flight per large object; up to max_workers * PART_CONCURRENCY requests share one client
+PART_CONCURRENCY = 4
+
+
+def client_config(max_workers=MAX_WORKERS):
+    """botocore config whose connection pool fits every concurrent request of download_objects"""
+    from botocore.config import Config
+
+    return Config(max_pool_connections=max_workers * PART_CONCURRENCY)
+
+
+def get_s3_client(max_workers=MAX_WORKERS):
+    """Create an S3 client from the AWS credentials in streamlit secrets"""
+    import boto3
+    import streamlit as st
+
+    return boto3.client(
+        's3',
+        aws_access_key_id=st.secrets["aws"]["AWS_ACCESS_KEY_ID"],
+        aws_secret_access_key=st.secrets["aws"]["AWS_SECRET_ACCESS_KEY"],
+        region_name=st.secrets["aws"]["AWS_DEFAULT_REGION"],
+        config=client_config(max_workers)
+    )
+
+
+def _in_scope(key, prefixes):
+    """True if key starts with one of prefixes, or if no prefixes are given"""
+    return prefixes is None or key.startswith(tuple(prefixes))
+
+
+def list_bucket(s3, bucket_name, prefixes=None):
+    """
+    List every object in the bucket, or only the keys starting with one of prefixes.
+    Returns a dict of key -> {"etag", "size", "last_modified"}.
+    """
+    remote = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for prefix in prefixes if prefixes is not None else ("",):
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key']
+                if key.endswith('/'):
+                    # Folder placeholder objects have no content to sync
+                    continue
+                remote[key] = {
+                    "etag": obj['ETag'].strip('"'),
+                    "size": obj['Size'],
+                    "last_modified": obj['LastModified'].isoformat(),
+                }
+    return remote
+
+
+class DownloadProgress:
+    """Thread-safe byte counter shared by all transfers of one download run"""
+
+    def __init__(self, total_bytes, callback=None):
+        self.total_bytes = total_bytes
+        self.bytes_done = 0
+        self.files_done = 0
+        self.callback = callback
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes_done += n
+            if self.callback:
+                self.callback(self.bytes_done, self.total_bytes)
+
+    def file_done(self):
+        with self._lock:
+            self.files_done += 1
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "files": self.files_done,
+            "bytes": self.bytes_done,
+            "seconds": round(elapsed, 3),
+            "mb_per_s": round(self.bytes_done / (1024 * 1024) / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+def download_objects(s3, bucket_name, objects, local_dir, max_workers=MAX_WORKERS, progress_callback=None):
+    """
+    Download the given objects into local_dir using a bounded thread pool.
+
+    objects maps key -> size in bytes. Large objects are split into ranged GETs
+    by the boto3 transfer manager; the same client is shared by every worker, so its
+    pool should hold max_workers * PART_CONCURRENCY connections (see client_config).
+    progress_callback, if given, is called with (bytes_done, total_bytes).
+
+    Returns a stats dict with files, bytes, seconds and mb_per_s.
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    progress = DownloadProgress(sum(objects.values()), progress_callback)
+    transfer_config = TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=CHUNK_SIZE,
+        max_concurrency=PART_CONCURRENCY,
+    )
+
+    def download_one(key):
+        local_file_path = os.path.join(local_dir, key)
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        s3.download_file(bucket_name, key, local_file_path, Config=transfer_config, Callback=progress.add_bytes)
+        progress.file_done()
+        return key
+
+    if objects:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(download_one, key) for key in objects]
+            for future in as_completed(futures):
+                # Re-raise the first failed transfer instead of leaving a partial mirror unnoticed
+                future.result()
+
+    stats = progress.stats()
+    print(f"Downloaded {stats['files']} files ({stats['bytes']} bytes) in {stats['seconds']}s, {stats['mb_per_s']} MB/s")
+    return stats
+
+
+def download_s3_bucket(bucket_name, local_dir, s3=None, max_workers=MAX_WORKERS, progress_callback=None):
+    """Download every object of the bucket into local_dir in parallel and return the transfer stats"""
+    if s3 is None:
+        s3 = get_s3_client(max_workers)
+    remote = list_bucket(s3, bucket_name)
+    objects = {key: entry["size"] for key, entry in remote.items()}
+    return download_objects(s3, bucket_name, objects, local_dir, max_workers, progress_callback)
+
+
+def load_manifest(local_dir):
+    """Load the manifest written by the last sync, or an empty one"""
+    manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(local_dir, manifest):
+    """Atomically write the manifest so an interrupted sync never leaves it half-written"""
+    os.makedirs(local_dir, exist_ok=True)
+    manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _is_unchanged(local_dir, key, entry, remote_entry):
+    """An object is unchanged if the manifest matches the listing and the local file is intact"""
+    if entry is None or entry != remote_entry:
+        return False
+    local_file_path = os.path.join(local_dir, key)
+    return os.path.isfile(local_file_path) and os.path.getsize(local_file_path) == remote_entry["size"]
+
+
+def sync_s3_bucket(bucket_name, local_dir, s3=None, delete=True, max_workers=MAX_WORKERS, progress_callback=None,
+                   prefixes=None):
+    """
+    Incrementally mirror an S3 bucket into local_dir.
+
+    A manifest of ETag, size and last-modified per key is kept in local_dir.
+    Unchanged objects are skipped, new or changed objects are downloaded and,
+    if delete is set, local files whose key no longer exists are removed.
+    With prefixes, only keys starting with one of them are synced or deleted;
+    manifest entries for other keys are left as they are.
+
+    Returns a report dict with the "downloaded", "skipped" and "deleted" keys
+    plus the transfer "stats" from download_objects.
+    """
+    if s3 is None:
+        s3 = get_s3_client(max_workers)
+
+    remote = list_bucket(s3, bucket_name, prefixes)
+    manifest = load_manifest(local_dir)
+    report = {"downloaded": [], "skipped": [], "deleted": []}
+
+    changed = {}
+    for key, remote_entry in remote.items():
+        if _is_unchanged(local_dir, key, manifest.get(key), remote_entry):
+            report["skipped"].append(key)
+        else:
+            changed[key] = remote_entry["size"]
+
+    report["stats"] = download_objects(s3, bucket_name, changed, local_dir, max_workers, progress_callback)
+    for key in changed:
+        manifest[key] = remote[key]
+    report["downloaded"] = sorted(changed)
+
+    if delete:
+        for key in sorted(key for key in set(manifest) - set(remote) if _in_scope(key, prefixes)):
+            local_file_path = os.path.join(local_dir, key)
+            if os.path.isfile(local_file_path):
+                print(f"Removing stale {local_file_path}")
+                os.remove(local_file_path)
+            del manifest[key]
+            report["deleted"].append(key)
+
+    save_manifest(local_dir, manifest)
+    print(
+        f"Synced s3://{bucket_name}: {len(report['downloaded'])} downloaded, "
+        f"{len(report['skipped'])} unchanged, {len(report['deleted'])} deleted"
+    )
+    return report
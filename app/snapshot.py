@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from numpy_index import STORAGE_DTYPES, NumpyIndex, quantize_rows, truncate_rows
+
+# Layout: fixed header | padding to DATA_OFFSET | embedding matrix | int8 row scales | metadata JSON
+#   header = magic, format version, rows, dim, metadata length, sha256 of everything after the header, storage code
+# Version 1 files have a zero byte where the storage code is, which reads as float32.
+MAGIC = b"FOODSNAP"
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sIIIQ32sB")
+DATA_OFFSET = 64
+STORAGE_CODES = {"float32": 0, "float16": 1, "int8": 2}
+SCALE_DTYPE = np.dtype("<f4")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is truncated, corrupted or of an unsupported version"""
+
+
+def _sha256_file(path, offset):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def write_snapshot(path, documents, metadatas, embeddings, model, dimensions=None, storage="float32"):
+    """
+    Pack descriptions, their metadata and the embedding matrix into one file.
+    Rows are L2-normalized so a search is a single matrix-vector product, and may be
+    truncated to dimensions and stored as float16 or int8 to shrink the file.
+    The file is written next to path and renamed into place once complete.
+    """
+    matrix, scales = quantize_rows(truncate_rows(embeddings, dimensions), storage)
+    if matrix.shape[0] != len(documents) or len(documents) != len(metadatas):
+        raise ValueError("documents, metadatas and embeddings must have the same number of rows")
+
+    meta = json.dumps({
+        "model": model,
+        "documents": list(documents),
+        "metadatas": list(metadatas),
+    }).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * DATA_OFFSET)
+        f.write(matrix.tobytes())
+        if scales is not None:
+            f.write(scales.astype(SCALE_DTYPE).tobytes())
+        f.write(meta)
+    checksum = _sha256_file(tmp_path, DATA_OFFSET)
+    with open(tmp_path, "r+b") as f:
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, matrix.shape[0], matrix.shape[1], len(meta), checksum, STORAGE_CODES[storage]
+        ))
+    os.replace(tmp_path, path)
+    print(f"Snapshot with {matrix.shape[0]} vectors of dim {matrix.shape[1]} ({storage}) saved at: {path}")
+
+
+class Snapshot(NumpyIndex):
+    """
+    A memory-mapped snapshot opened read-only and searched exactly like a NumpyIndex.
+    The embedding matrix is never copied into the process, so workers share its pages.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        file_size = os.path.getsize(path)
+        if file_size < DATA_OFFSET:
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        with open(path, "rb") as f:
+            magic, version, rows, dim, meta_len, checksum, storage_code = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a food DB snapshot")
+        if version not in SUPPORTED_VERSIONS:
+            raise SnapshotError(f"Unsupported snapshot version {version}, expected one of {SUPPORTED_VERSIONS}")
+        storage = {code: name for name, code in STORAGE_CODES.items()}.get(storage_code)
+        if storage is None:
+            raise SnapshotError(f"Unknown storage code {storage_code} in snapshot {path}")
+        dtype = STORAGE_DTYPES[storage]
+        matrix_bytes = rows * dim * dtype.itemsize
+        scales_bytes = rows * SCALE_DTYPE.itemsize if storage == "int8" else 0
+        if file_size != DATA_OFFSET + matrix_bytes + scales_bytes + meta_len:
+            raise SnapshotError(f"Snapshot {path} is truncated or has trailing data")
+        if verify and _sha256_file(path, DATA_OFFSET) != checksum:
+            raise SnapshotError(f"Checksum mismatch for snapshot {path}")
+
+        with open(path, "rb") as f:
+            f.seek(DATA_OFFSET + matrix_bytes)
+            scales = np.frombuffer(f.read(scales_bytes), dtype=SCALE_DTYPE) if scales_bytes else None
+            meta = json.loads(f.read(meta_len).decode("utf-8"))
+        super().__init__(
+            np.memmap(path, dtype=dtype, mode="r", offset=DATA_OFFSET, shape=(rows, dim)),
+            meta["documents"],
+            meta["metadatas"],
+            scales
+        )
+        self.version = version
+        self.storage = storage
+        self.checksum = checksum.hex()
+        self.model = meta["model"]
+
+
+def open_snapshot(path, verify=True):
+    """Open a snapshot file, checking its format version and checksum"""
+    return Snapshot(path, verify=verify)
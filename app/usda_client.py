@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USDA_BASE_URL = os.getenv("USDA_BASE_URL", "https://api.nal.usda.gov/fdc/v1")
+USDA_CACHE_PATH = os.getenv("USDA_CACHE_PATH", "../data/cache/usda.sqlite")
+USDA_CACHE_TTL = float(os.getenv("USDA_CACHE_TTL", str(30 * 24 * 3600)))
+# api.data.gov allows 1,000 requests per hour per key by default
+USDA_RATE_LIMIT = float(os.getenv("USDA_RATE_LIMIT", "1000"))
+USDA_MAX_WORKERS = int(os.getenv("USDA_MAX_WORKERS", "8"))
+USDA_TIMEOUT = float(os.getenv("USDA_TIMEOUT", "10"))
+USDA_MAX_RETRIES = int(os.getenv("USDA_MAX_RETRIES", "3"))
+# The /foods endpoint accepts at most 20 fdcIds per request
+BULK_SIZE = 20
+
+_lock = threading.Lock()
+_client = None
+
+
+class RateLimiter:
+    """Token bucket allowing requests_per_hour requests, with bursts of up to burst requests"""
+
+    def __init__(self, requests_per_hour: float, burst: int = 10):
+        self.rate = requests_per_hour / 3600
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """SQLite cache of USDA responses keyed by endpoint and request key (query plus dataType, or fdcId)"""
+
+    def __init__(self, path: str = USDA_CACHE_PATH, ttl: float = USDA_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "endpoint TEXT NOT NULL, key TEXT NOT NULL, body TEXT NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (endpoint, key))"
+        )
+        self._conn.commit()
+
+    def get(self, endpoint: str, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM responses WHERE endpoint = ? AND key = ? AND created >= ?",
+                (endpoint, key, time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, endpoint: str, key: str, body):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (endpoint, key, body, created) VALUES (?, ?, ?, ?)",
+                (endpoint, key, json.dumps(body), time.time())
+            )
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _search_key(query: str, data_type) -> str:
+    if isinstance(data_type, (list, tuple)):
+        data_type = ",".join(sorted(data_type))
+    return json.dumps([query.lower(), data_type])
+
+
+class USDAClient:
+    """
+    FoodData Central client with one pooled keep-alive session, retries with backoff on
+    429 and 5xx, client-side rate limiting and a persistent response cache.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = USDA_BASE_URL, cache: ResponseCache = None,
+                 requests_per_hour: float = USDA_RATE_LIMIT, max_workers: int = USDA_MAX_WORKERS,
+                 timeout: float = USDA_TIMEOUT, max_retries: int = USDA_MAX_RETRIES):
+        self.api_key = api_key or os.getenv("USDA_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache if cache is not None else ResponseCache()
+        self.rate_limiter = RateLimiter(requests_per_hour)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "POST"),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method: str, path: str, **kwargs):
+        self.rate_limiter.acquire()
+        params = {**kwargs.pop("params", {}), "api_key": self.api_key}
+        response = self.session.request(method, f"{self.base_url}{path}", params=params, timeout=self.timeout, **kwargs)
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status code {response.status_code}")
+        return response.json()
+
+    def search(self, query: str, data_type=None) -> dict:
+        """
+        Return the top /foods/search result for query, which must match the description exactly
+        (the same contract as usda_api.get_food_nutrition_info). Raises ValueError otherwise.
+        """
+        key = _search_key(query, data_type)
+        foods = self.cache.get("search", key)
+        if foods is None:
+            params = {"query": query, "pageSize": 1}
+            if data_type:
+                params["dataType"] = ",".join(data_type) if isinstance(data_type, (list, tuple)) else data_type
+            foods = self._request("GET", "/foods/search", params=params).get("foods", [])
+            self.cache.put("search", key, foods)
+
+        if not foods:
+            raise ValueError(f"No food found for query: {query}")
+        food = foods[0]
+        if food.get("description", "").lower() != query.lower():
+            raise ValueError(f"No exact match found for query: {query}")
+        return food
+
+    def search_many(self, queries: list, data_type=None) -> list:
+        """
+        Look up many queries concurrently. Returns one result per query, in order;
+        a query that fails gives its exception instead of a food.
+        Queries that share a cache key are looked up once.
+        """
+        def safe_search(query):
+            try:
+                return self.search(query, data_type)
+            except Exception as e:
+                return e
+
+        unique = {}
+        for query in queries:
+            unique.setdefault(_search_key(query, data_type), query)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(unique, executor.map(safe_search, unique.values())))
+        return [results[_search_key(query, data_type)] for query in queries]
+
+    def get_foods(self, fdc_ids: list) -> dict:
+        """Fetch full food records by fdcId through the bulk /foods endpoint; returns {fdcId: food}"""
+        foods = {}
+        missing = []
+        for fdc_id in dict.fromkeys(int(fdc_id) for fdc_id in fdc_ids):
+            cached = self.cache.get("food", str(fdc_id))
+            if cached is not None:
+                foods[fdc_id] = cached
+            else:
+                missing.append(fdc_id)
+
+        batches = [missing[i:i + BULK_SIZE] for i in range(0, len(missing), BULK_SIZE)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in executor.map(lambda ids: self._request("POST", "/foods", json={"fdcIds": ids}), batches):
+                for food in batch:
+                    self.cache.put("food", str(food["fdcId"]), food)
+                    foods[food["fdcId"]] = food
+        return foods
+
+    def close(self):
+        self.session.close()
+
+
+def get_usda_client() -> USDAClient:
+    """Return the process-wide USDA client, so all callers share its connection pool and rate limit"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = USDAClient()
+        return _client
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+
+import streamlit as st
+
+from match_cache import MatchCache
+from openai_client import embeddings_kwargs
+from s3_sync import get_s3_client, list_bucket, load_manifest, sync_s3_bucket
+
+BUCKET_NAME = "food-ai-db"
+LOCAL_DIR = "../data/food_db_cloud/"
+COLLECTION_NAME = "food_items_collection"
+EMBEDDING_MODEL = "text-embedding-3-large"
+# Reduced query embedding size; must match a Chroma collection built with the same dimensions.
+# The NumPy and snapshot backends truncate queries to their own size either way.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+SNAPSHOT_NAME = "food_db.snap"
+NUMPY_INDEX_NAME = "numpy_index"
+CHROMA_DIR_NAME = "vector_db_json"
+# "auto" uses the snapshot when the bucket has one and Chroma otherwise
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+BACKENDS = ("auto", "chroma", "numpy", "snapshot")
+
+
+class SharedVectorStore:
+    """
+    Read-only vector store shared by every Streamlit session of the process.
+
+    Query embeddings are computed outside the lock so concurrent sessions do not
+    wait on each other's network calls; only the index lookup is serialized.
+    Ingredients seen before are answered from the shared match cache, and queries the
+    lexical matcher is confident about skip the embedding call entirely.
+    reload() swaps in a freshly loaded store, in-flight searches finish on the old one.
+    """
+
+    def __init__(self, db, embeddings, matcher=None, version=None):
+        self._db = db
+        self._embeddings = embeddings
+        self._matcher = matcher
+        self.version = version
+        self.match_cache = MatchCache()
+        self._lock = threading.RLock()
+
+    def similarity_search(self, query, k=1):
+        return self.batch_similarity_search([query], k=k)[0]
+
+    def batch_similarity_search(self, queries, k=1):
+        """
+        Search for many queries in one round trip: one embedding request for the
+        queries without a confident lexical match and one index query.
+        Returns one Document list per query.
+        """
+        results = [None] * len(queries)
+        version = self.version
+        if k == 1:
+            for i, query in enumerate(queries):
+                results[i] = self.match_cache.get(query, version)
+            matcher = self._matcher
+            if matcher is not None:
+                for i, query in enumerate(queries):
+                    if results[i] is None:
+                        doc = matcher.match(query)
+                        if doc is not None:
+                            results[i] = [doc]
+                            self.match_cache.put(query, results[i], version)
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            embeddings = self._embeddings.embed_documents([queries[i] for i in pending])
+            with self._lock:
+                matches = _batch_search(self._db, embeddings, k)
+            for i, docs in zip(pending, matches):
+                results[i] = docs
+                if k == 1:
+                    self.match_cache.put(queries[i], docs, version)
+        return results
+
+    def retrieval_stats(self):
+        """Counters of the match cache, the lexical fast path and the embedding cache"""
+        stats = {"match_cache": self.match_cache.stats()}
+        if self._matcher is not None:
+            stats.update(self._matcher.stats())
+        if hasattr(self._embeddings, "stats"):
+            stats["embedding_cache"] = self._embeddings.stats()
+        return stats
+
+    def reload(self, db, embeddings=None, matcher=None, version=None):
+        with self._lock:
+            self._db = db
+            # A new version makes the match cache drop every entry on its next access
+            self.version = version
+            if embeddings is not None:
+                self._embeddings = embeddings
+            if matcher is not None:
+                self._matcher = matcher
+
+
+def _batch_search(db, embeddings, k):
+    """Query the index once for all embeddings, whichever backend is loaded"""
+    if hasattr(db, "batch_similarity_search_by_vector"):
+        return db.batch_similarity_search_by_vector(embeddings, k=k)
+    from langchain_core.documents import Document
+
+    # langchain_chroma only exposes single-vector search, so query the collection directly
+    result = db._collection.query(query_embeddings=embeddings, n_results=k, include=["documents", "metadatas"])
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(result["documents"], result["metadatas"])
+    ]
+
+
+def _build_matcher(db):
+    """Build the lexical fast-path index over the descriptions held by the loaded backend"""
+    from lexical_matcher import LexicalMatcher
+
+    if hasattr(db, "documents"):
+        return LexicalMatcher(db.documents, db.metadatas)
+    data = db.get(include=["documents", "metadatas"])
+    return LexicalMatcher(data["documents"], data["metadatas"])
+
+
+def _index_version(backend, local_dir=LOCAL_DIR):
+    """Identify the loaded snapshot by the ETags in the sync manifest and the backend"""
+    manifest = load_manifest(local_dir)
+    payload = json.dumps({"backend": backend, "etags": {key: entry["etag"] for key, entry in manifest.items()}}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _check_dimensions(index, dimensions=EMBEDDING_DIMENSIONS):
+    """Fail at load time, not on the first query, if query embeddings are narrower than the index"""
+    if dimensions is not None and dimensions < index.dimensions:
+        raise ValueError(
+            f"EMBEDDING_DIMENSIONS={dimensions} is smaller than the index width {index.dimensions}; "
+            f"unset it or rebuild the index with dimensions={dimensions}"
+        )
+    return index
+
+
+def _sync_index(backend, local_dir=LOCAL_DIR):
+    """
+    Sync only the files the backend reads, so e.g. the snapshot backend never downloads the Chroma directory.
+    "auto" picks the snapshot if the bucket has one and Chroma otherwise. Returns the resolved backend.
+    """
+    s3 = get_s3_client()
+    if backend == "auto":
+        backend = "snapshot" if SNAPSHOT_NAME in list_bucket(s3, BUCKET_NAME, (SNAPSHOT_NAME,)) else "chroma"
+    prefixes = {
+        "snapshot": (SNAPSHOT_NAME,),
+        "numpy": (NUMPY_INDEX_NAME + "/",),
+        "chroma": (CHROMA_DIR_NAME + "/",),
+    }[backend]
+    sync_s3_bucket(BUCKET_NAME, local_dir, s3=s3, prefixes=prefixes)
+    return backend
+
+
+def _load_db(backend=VECTOR_BACKEND, local_dir=LOCAL_DIR):
+    """
+    Sync the snapshot from S3 and open it with the requested retrieval backend:
+    "chroma" (HNSW collection), "numpy" (exact search over a memory-mapped .npy matrix),
+    "snapshot" (exact search over the single-file snapshot) or "auto".
+    """
+    # The index and embedding libraries are imported on first load, not when the app starts
+    from langchain_chroma import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+    from embedding_cache import CachedEmbeddings
+    from numpy_index import load_numpy_index
+    from snapshot import open_snapshot
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend {backend!r}, expected one of {BACKENDS}")
+    backend = _sync_index(backend, local_dir)
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+            **embeddings_kwargs()
+        ),
+        model=f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL
+    )
+    if backend == "snapshot":
+        return _check_dimensions(open_snapshot(os.path.join(local_dir, SNAPSHOT_NAME))), embeddings
+    if backend == "numpy":
+        return _check_dimensions(load_numpy_index(os.path.join(local_dir, NUMPY_INDEX_NAME))), embeddings
+    db = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=os.path.join(local_dir, CHROMA_DIR_NAME)
+    )
+    return db, embeddings
+
+
+@st.cache_resource(show_spinner=False)
+def get_vector_store(backend=VECTOR_BACKEND):
+    """Load the vector store once per server process and backend, and share it across sessions"""
+    db, embeddings = _load_db(backend)
+    return SharedVectorStore(db, embeddings, _build_matcher(db), _index_version(backend))
+
+
+def reload_vector_store(backend=VECTOR_BACKEND):
+    """Re-sync the snapshot and swap it into the shared store, e.g. after a new upload to S3"""
+    store = get_vector_store(backend)
+    db, embeddings = _load_db(backend)
+    store.reload(db, embeddings, _build_matcher(db), _index_version(backend))
+    return store
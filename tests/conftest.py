@@ -0,0 +1,28 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# The app modules import each other as top-level modules, the way streamlit runs them from app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """A fake_openai_server on a free port with the shared clients pointed at it; yields (fake, server)"""
+    import metrics
+    import openai_client
+    from fake_openai_server import FakeOpenAI, make_server
+
+    fake = FakeOpenAI()
+    server = make_server(fake, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(openai_client, "MODEL_BACKEND", "local")
+    monkeypatch.setattr(openai_client, "LOCAL_MODEL_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(metrics, "METRICS_JSON_LOGS", False)
+    yield fake, server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from import_profile import ENTRY_POINTS, check, profile_import
+
+# Shared CI runners are slower than a laptop; raise the budgets there instead of editing them
+SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", "1.5"))
+
+
+@pytest.mark.parametrize("module", sorted(ENTRY_POINTS))
+def test_entry_point_import_budget(module):
+    try:
+        profile_import(module)
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"{module} dependencies are not installed: {str(e).splitlines()[-1]}")
+        raise
+    assert check([module], repeats=3, scale=SCALE) == []
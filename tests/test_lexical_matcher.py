@@ -0,0 +1,95 @@
+from lexical_matcher import LEXICAL_THRESHOLD, LexicalMatcher, choose_threshold
+
+# A slice of SR Legacy descriptions, with near misses for each labelled query
+DESCRIPTIONS = [
+    "Cucumber, with peel, raw",
+    "Cucumber, peeled, raw",
+    "Pickles, cucumber, dill or kosher dill",
+    "Rice, white, long-grain, regular, raw, enriched",
+    "Rice, white, long-grain, regular, enriched, cooked",
+    "Rice, brown, long-grain, cooked",
+    "Rice crackers",
+    "Apples, raw, with skin",
+    "Apple juice, canned or bottled, unsweetened",
+    "Applesauce, canned, unsweetened",
+    "Bananas, raw",
+    "Banana chips",
+    "Broccoli, raw",
+    "Broccoli, cooked, boiled, drained, without salt",
+    "Avocados, raw, all commercial varieties",
+    "Fish, salmon, Atlantic, farmed, raw",
+    "Fish, salmon, pink, canned",
+    "Egg, whole, raw, fresh",
+    "Egg, whole, cooked, scrambled",
+    "Cheese, cheddar",
+    "Cheese, cottage, creamed",
+    "Bread, whole-wheat, commercially prepared",
+    "Seeds, sesame seeds, whole, dried",
+    "Seaweed, wakame, raw",
+    "Pineapple, raw, all varieties",
+    "Pineapple juice, canned, unsweetened",
+    "Chicken, broilers or fryers, breast, meat only, cooked, roasted",
+    "Tomatoes, red, ripe, raw, year round average",
+    "Carrots, raw",
+    "Carrot juice, canned",
+]
+
+# (ingredient, expected description); the lexical path must never return anything else
+LABELS = [
+    ("cucumber", "Cucumber, with peel, raw"),
+    ("raw cucumber", "Cucumber, with peel, raw"),
+    # The raw entry is dry rice; a plate of white rice is cooked
+    ("white rice", "Rice, white, long-grain, regular, enriched, cooked"),
+    ("apple", "Apples, raw, with skin"),
+    ("apples", "Apples, raw, with skin"),
+    ("banana", "Bananas, raw"),
+    ("broccoli", "Broccoli, raw"),
+    ("avocado", "Avocados, raw, all commercial varieties"),
+    ("pineapple", "Pineapple, raw, all varieties"),
+    ("carrots", "Carrots, raw"),
+    ("raw carrots", "Carrots, raw"),
+    ("cheddar cheese", "Cheese, cheddar"),
+    ("brown rice", "Rice, brown, long-grain, cooked"),
+    ("salmon", "Fish, salmon, Atlantic, farmed, raw"),
+    ("scrambled eggs", "Egg, whole, cooked, scrambled"),
+    ("grilled chicken breast", "Chicken, broilers or fryers, breast, meat only, cooked, roasted"),
+    ("sesame seeds", "Seeds, sesame seeds, whole, dried"),
+    ("seaweed", "Seaweed, wakame, raw"),
+    ("whole wheat bread", "Bread, whole-wheat, commercially prepared"),
+    ("tomato", "Tomatoes, red, ripe, raw, year round average"),
+    ("apple juice", "Apple juice, canned or bottled, unsweetened"),
+    ("rice", "Rice, white, long-grain, regular, enriched, cooked"),
+    ("cottage cheese", "Cheese, cottage, creamed"),
+]
+
+
+def make_matcher():
+    return LexicalMatcher(DESCRIPTIONS, [{"row": i} for i in range(len(DESCRIPTIONS))])
+
+
+def test_raw_is_only_matched_when_asked_for():
+    matcher = make_matcher()
+    index, confidence = matcher.best_match("raw cucumber")
+    assert matcher.documents[index] == "Cucumber, with peel, raw"
+    assert confidence >= LEXICAL_THRESHOLD
+    # "Rice, white, ..., raw" must not skip vector search for cooked rice
+    _, confidence = matcher.best_match("white rice")
+    assert confidence < LEXICAL_THRESHOLD
+
+
+def test_default_threshold_has_no_wrong_hits_on_the_labelled_set():
+    matcher = make_matcher()
+    hits = 0
+    for query, expected in LABELS:
+        index, confidence = matcher.best_match(query)
+        if confidence >= LEXICAL_THRESHOLD:
+            hits += 1
+            assert matcher.documents[index] == expected, query
+    assert hits > 0
+
+
+def test_choose_threshold_stops_below_the_first_wrong_hit():
+    matcher = make_matcher()
+    # "rice" and "white rice" score 0.8 against wrong descriptions, tied with right answers
+    assert choose_threshold(matcher, LABELS) == 1.0
+    assert choose_threshold(matcher, LABELS, min_precision=0.8) < 0.8
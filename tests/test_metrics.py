@@ -0,0 +1,56 @@
+import metrics
+from agents import agent2_nutrition_augmentation_stream
+
+
+def histogram(name, agent):
+    for (metric, labels), value in metrics.registry._histograms.items():
+        if metric == name and dict(labels).get("agent") == agent:
+            return value
+    return None
+
+
+def test_stream_latency_covers_the_whole_stream(fake_openai):
+    fake, _ = fake_openai
+    fake.token_rate = lambda: 400.0
+    before = histogram("food_ai_agent_latency_seconds", "agent2_stream")
+    before_sum = before.sum if before else 0.0
+
+    text = "".join(agent2_nutrition_augmentation_stream("aGk=", {}, ["salmon"]))
+
+    latency = histogram("food_ai_agent_latency_seconds", "agent2_stream")
+    first_token = histogram("food_ai_agent_first_token_seconds", "agent2_stream")
+    # About 120 tokens at 400 tokens/s: the recorded time must include the generation, not just the headers
+    assert "Summary" in text
+    assert latency.sum - before_sum > 0.2
+    assert first_token is not None and first_token.sum < latency.sum - before_sum
+    tokens = [
+        value for (metric, labels), value in metrics.registry._counters.items()
+        if metric == "food_ai_agent_tokens_total" and dict(labels)["agent"] == "agent2_stream"
+    ]
+    assert sum(tokens) > 0
+
+
+def test_concurrent_textfile_writes(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = tmp_path / "food_ai.prom"
+    monkeypatch.setattr(metrics, "METRICS_TEXTFILE", str(path))
+    monkeypatch.setattr(metrics, "METRICS_JSON_LOGS", False)
+
+    def record(_):
+        for _ in range(100):
+            metrics.record_call("textfile_test", 0.01, 0.0, 0, "ok")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(record, range(4)))
+
+    assert 'food_ai_agent_latency_seconds_count{agent="textfile_test"' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ["food_ai.prom"]
+
+
+def test_image_prep_is_recorded(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_JSON_LOGS", False)
+    metrics.record_image_prep(4_000_000, 300_000, 0.2)
+    text = metrics.registry.to_prometheus()
+    assert 'food_ai_image_bytes_total{stage="encoded"}' in text
+    assert "food_ai_image_prep_seconds_count" in text
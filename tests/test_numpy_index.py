@@ -0,0 +1,45 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from numpy_index import build_index, load_numpy_index, save_numpy_index
+
+
+def corpus(rows=2000, dimensions=3072, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((rows, dimensions)).astype(np.float32)
+    documents = [f"food {i}" for i in range(rows)]
+    return documents, [{} for _ in documents], embeddings
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_reduced_precision_matches_float32(storage):
+    documents, metadatas, embeddings = corpus()
+    queries = embeddings[:20] + 0.1 * np.random.default_rng(1).standard_normal((20, embeddings.shape[1])).astype(np.float32)
+    exact, _ = build_index(documents, metadatas, embeddings).top_k(queries, k=1)
+    reduced, _ = build_index(documents, metadatas, embeddings, storage=storage).top_k(queries, k=1)
+    assert (exact == reduced).all()
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_query_does_not_copy_the_matrix(tmp_path, storage):
+    documents, metadatas, embeddings = corpus()
+    save_numpy_index(tmp_path, documents, metadatas, embeddings, storage=storage)
+    index = load_numpy_index(tmp_path)
+    query = embeddings[:1]
+    index.top_k(query)
+
+    tracemalloc.start()
+    index.top_k(query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # A float32 copy of the matrix would be about 24 MB
+    assert peak < 8 * 1024 * 1024
+
+
+def test_narrower_queries_are_rejected():
+    documents, metadatas, embeddings = corpus(rows=10, dimensions=64)
+    index = build_index(documents, metadatas, embeddings)
+    with pytest.raises(ValueError, match="dimensions"):
+        index.top_k(embeddings[:1, :32])
@@ -0,0 +1,101 @@
+from nutrition_parser import parse_summary_table, parse_value
+
+
+def as_dict(nutrition_list):
+    return {item["nutrient"]: (item["min"], item["max"]) for item in nutrition_list}
+
+
+def test_range_cells():
+    text = """
+**Summary**
+
+| Nutrient | Total Estimated Values (±10%) |
+|---|---|
+| Energy | 493 - 611 kcal |
+| Protein | 32 - 39 g |
+| Fat | 25 - 32 g |
+| Carbohydrates | 31 - 42 g |
+"""
+    assert as_dict(parse_summary_table(text)) == {
+        "energy": (493, 611), "protein": (32, 39), "fat": (25, 32), "carbs": (31, 42)
+    }
+
+
+def test_min_and_max_columns():
+    text = """
+### Summary
+| Nutrient | Min | Max |
+|---|---|---|
+| Energy (kcal) | 650 | 720 |
+| Protein (g) | 30 | 36 |
+| Fat (g) | 20 | 25 |
+| Carbohydrates (g) | 70 | 80 |
+"""
+    assert as_dict(parse_summary_table(text)) == {
+        "energy": (650, 720), "protein": (30, 36), "fat": (20, 25), "carbs": (70, 80)
+    }
+
+
+def test_saturated_fat_row_is_not_fat():
+    text = """
+Summary
+| Nutrient | Range |
+|---|---|
+| Energy | 600-700 kcal |
+| Protein | 30-35 g |
+| Saturated Fat | 5-6 g |
+| Total Fat | 20-25 g |
+| Dietary Fiber | 4-6 g |
+| Carbohydrates | 60-70 g |
+"""
+    result = as_dict(parse_summary_table(text))
+    assert result["fat"] == (20, 25)
+    assert result["carbs"] == (60, 70)
+
+
+def test_total_row_overrides_earlier_row():
+    text = """
+Summary
+| Nutrient | Range |
+|---|---|
+| Energy | 600-700 kcal |
+| Protein | 30-35 g |
+| Fat | 5-6 g |
+| Total Fat | 20-25 g |
+| Carbohydrates | 60-70 g |
+"""
+    assert as_dict(parse_summary_table(text))["fat"] == (20, 25)
+
+
+def test_plus_minus_and_single_values():
+    assert parse_value("550 kcal ± 10%") == (495.0, 605.0)
+    assert parse_value("30 ± 3 g") == (27.0, 33.0)
+    assert parse_value("42 g") == (42.0, 42.0)
+    assert parse_value("1,200–1,400") == (1200.0, 1400.0)
+
+
+def test_missing_nutrient_fails_validation():
+    text = """
+Summary
+| Energy | 600-700 kcal |
+| Protein | 30-35 g |
+| Fat | 20-25 g |
+"""
+    assert parse_summary_table(text) is None
+
+
+def test_no_summary_heading_is_left_to_the_fallback():
+    text = """
+Salmon (80-90g):
+| Energy | 160-180 kcal |
+| Protein | 17-20 g |
+| Fat | 9-11 g |
+| Carbohydrates | 0-1 g |
+
+### Totals
+| Energy | 350-390 kcal |
+| Protein | 25-30 g |
+| Fat | 12-15 g |
+| Carbohydrates | 35-40 g |
+"""
+    assert parse_summary_table(text) is None
@@ -0,0 +1,12 @@
+import openai_client
+
+
+def test_calls_reuse_one_connection(fake_openai):
+    fake, _ = fake_openai
+    for _ in range(5):
+        client = openai_client.get_client()
+        client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "Hello"}])
+
+    assert client is openai_client.get_client()
+    assert fake.requests == 5
+    assert fake.connections == 1
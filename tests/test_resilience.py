@@ -0,0 +1,17 @@
+import time
+
+import pytest
+
+from agents import agent2_nutrition_augmentation_stream
+from resilience import LatencyBudget, latency_budget
+
+
+def test_stream_generation_is_bounded_by_the_budget(fake_openai):
+    fake, _ = fake_openai
+    # About 120 tokens at 20 tokens/s would take six seconds
+    fake.token_rate = lambda: 20.0
+    start = time.monotonic()
+    # agents wraps every failure, DeadlineExceeded included, in a plain Exception
+    with pytest.raises(Exception, match="exceeded its latency budget while streaming"), latency_budget(LatencyBudget(1.0)):
+        "".join(agent2_nutrition_augmentation_stream("aGk=", {}, ["salmon"]))
+    assert time.monotonic() - start < 2.0
@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from result_cache import ResultCache
+
+
+def png(array) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.asarray(array, dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def jpeg(image_bytes: bytes, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(image_bytes)).convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def textured(seed=0):
+    rng = np.random.default_rng(seed)
+    return png(np.kron(rng.integers(0, 256, (16, 16, 3)), np.ones((16, 16, 1))))
+
+
+def test_exact_match(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    image = textured()
+    cache.put(image, ["rice"], "markdown")
+    assert cache.get(image) == {"ingredients": ["rice"], "nutrition_augmentation": "markdown", "totals": None, "summary": None}
+
+
+def test_totals_and_summary_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    image = textured()
+    totals = [{"nutrient": "energy", "min": 350.0, "max": 390.0}]
+    cache.put(image, ["rice"], "markdown", totals, "Rice bowl")
+    result = cache.get(image)
+    assert result["totals"] == totals and result["summary"] == "Rice bowl"
+
+
+def test_old_cache_files_gain_the_new_columns(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "results.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE results (sha256 TEXT PRIMARY KEY, dhash INTEGER NOT NULL, ingredients TEXT NOT NULL, "
+        "nutrition_augmentation TEXT, created REAL NOT NULL)"
+    )
+    conn.commit()
+    conn.close()
+    cache = ResultCache(path)
+    cache.put(textured(), ["rice"], "markdown", [], "summary")
+    assert cache.get(textured())["summary"] == "summary"
+
+
+def test_near_duplicates_are_opt_in(tmp_path):
+    image = textured()
+    recompressed = jpeg(image, 70)
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    cache.put(image, ["rice"])
+    assert cache.get(recompressed) is None
+
+    # Rows stored while the lookup was off are not hashed, so they never match
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_distance=4)
+    assert cache.get(recompressed) is None
+    cache.put(image, ["rice"])
+    assert cache.get(recompressed)["ingredients"] == ["rice"]
+    assert cache.get(textured(seed=1)) is None
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+    image = textured()
+    cache.put(image, ["rice"])
+    cache._conn.execute("UPDATE results SET created = created - 120")
+    assert cache.get(image) is None
+
+
+def test_low_detail_images_never_match(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_distance=4)
+    cache.put(png(np.full((64, 64, 3), (200, 30, 30))), ["tomato soup"])
+    assert cache.get(png(np.full((64, 64, 3), (30, 30, 200)))) is None
@@ -0,0 +1,93 @@
+import datetime
+import hashlib
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from s3_sync import MANIFEST_NAME, load_manifest, sync_s3_bucket
+
+
+class StubS3:
+    """In-memory stand-in for the parts of the boto3 S3 client that s3_sync uses"""
+
+    def __init__(self, objects):
+        self.objects = {}
+        self.downloads = []
+        for key, body in objects.items():
+            self.put(key, body)
+
+    def put(self, key, body):
+        self.objects[key] = (body, datetime.datetime.now(datetime.timezone.utc))
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        contents = [
+            {"Key": key, "ETag": f'"{hashlib.md5(body).hexdigest()}"', "Size": len(body), "LastModified": modified}
+            for key, (body, modified) in sorted(self.objects.items()) if key.startswith(Prefix)
+        ]
+        yield {"Contents": contents}
+
+    def download_file(self, bucket, key, path, Config=None, Callback=None):
+        body = self.objects[key][0]
+        with open(path, "wb") as f:
+            f.write(body)
+        self.downloads.append(key)
+        if Callback:
+            Callback(len(body))
+
+
+def sync(s3, local_dir, **kwargs):
+    s3.downloads.clear()
+    return sync_s3_bucket("food-ai-db", str(local_dir), s3=s3, **kwargs)
+
+
+def test_first_sync_downloads_everything(tmp_path):
+    s3 = StubS3({"food_db.snap": b"snapshot", "vector_db_json/chroma.sqlite3": b"chroma"})
+    report = sync(s3, tmp_path)
+
+    assert report["downloaded"] == ["food_db.snap", "vector_db_json/chroma.sqlite3"]
+    assert (tmp_path / "vector_db_json" / "chroma.sqlite3").read_bytes() == b"chroma"
+    assert set(load_manifest(str(tmp_path))) == {"food_db.snap", "vector_db_json/chroma.sqlite3"}
+
+
+def test_unchanged_objects_are_skipped_and_changed_ones_downloaded(tmp_path):
+    s3 = StubS3({"food_db.snap": b"snapshot", "numpy_index/embeddings.npy": b"matrix"})
+    sync(s3, tmp_path)
+
+    report = sync(s3, tmp_path)
+    assert s3.downloads == []
+    assert report["skipped"] == ["food_db.snap", "numpy_index/embeddings.npy"]
+
+    s3.put("food_db.snap", b"new snapshot")
+    report = sync(s3, tmp_path)
+    assert s3.downloads == ["food_db.snap"]
+    assert (tmp_path / "food_db.snap").read_bytes() == b"new snapshot"
+
+
+def test_stale_files_are_deleted(tmp_path):
+    s3 = StubS3({"food_db.snap": b"snapshot", "old.snap": b"old"})
+    sync(s3, tmp_path)
+
+    del s3.objects["old.snap"]
+    report = sync(s3, tmp_path)
+    assert report["deleted"] == ["old.snap"]
+    assert not (tmp_path / "old.snap").exists()
+    assert "old.snap" not in load_manifest(str(tmp_path))
+
+
+def test_prefixes_scope_downloads_and_deletions(tmp_path):
+    s3 = StubS3({"food_db.snap": b"snapshot", "vector_db_json/chroma.sqlite3": b"chroma"})
+    sync(s3, tmp_path, prefixes=("vector_db_json/",))
+    assert s3.downloads == ["vector_db_json/chroma.sqlite3"]
+
+    # Keys outside the prefixes are neither downloaded nor deleted, and keep their manifest entries
+    report = sync(s3, tmp_path, prefixes=("food_db.snap",))
+    assert report["downloaded"] == ["food_db.snap"]
+    assert report["deleted"] == []
+    assert (tmp_path / "vector_db_json" / "chroma.sqlite3").exists()
+    assert set(load_manifest(str(tmp_path))) == {"food_db.snap", "vector_db_json/chroma.sqlite3"}
+    assert (tmp_path / MANIFEST_NAME).exists()
@@ -0,0 +1,52 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from usda_client import ResponseCache, USDAClient
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """Stand-in for /foods/search that answers every query with a food of the same description"""
+    protocol_version = "HTTP/1.1"
+    queries = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        self.queries.append(query)
+        data = json.dumps({"foods": [{"fdcId": len(self.queries), "description": query.capitalize()}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def usda_server():
+    handler = type("Handler", (SearchHandler,), {"queries": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_many_sends_one_request_per_unique_query(usda_server, tmp_path):
+    handler, base_url = usda_server
+    client = USDAClient(api_key="test", base_url=base_url, cache=ResponseCache(str(tmp_path / "usda.sqlite")),
+                        requests_per_hour=0)
+    queries = ["apple", "banana", "Apple", "rice"] * 3
+
+    results = client.search_many(queries)
+
+    assert sorted(handler.queries) == ["apple", "banana", "rice"]
+    assert [food["description"].lower() for food in results] == [query.lower() for query in queries]
+    assert results[0] is results[2]
+    client.close()